@@ -3,7 +3,6 @@ import face_recognition
 import numpy as np
 import os
 import json
-import urllib.request
 import csv
 from datetime import datetime, timedelta
 from tkinter import Tk, Label, Entry, Button, StringVar, Frame, messagebox
@@ -11,11 +10,19 @@ from PIL import Image, ImageTk
 import math
 import time
 
+from camera_reader import IPCameraReader
+from attendance import AttendanceSink
+from face_quality import face_quality_ok as core_quality_ok, sharpness
+from profiling import Profiler
+from face_detectors import make_detector
+from encoding_cache import EncodingCache
+
 # -----------------------
 # Constants & paths
 # -----------------------
 KNOWN_FACE_DIR = "known_faces"
 DATA_FILE = "face_data.json"
+ENCODING_CACHE = "known_faces.cache.json"   # encodings by image SHA-1; unchanged images are never re-encoded
 ATTENDANCE_FILE = "attendance_log.csv"
 IP_FILE = "camera_ip.txt"
 
@@ -58,6 +65,11 @@ MIN_BLUR_VAR = 120.0       # Laplacian variance threshold
 COOLDOWN_SECS = 120        # per-person cooldown
 ENROLL_SHOTS = 5           # multi-shot capture
 UPSCALE = 1                # face_locations upsample factor
+DETECTOR = "hog"           # hog | haar | lbp[:cascade.xml] | dnn[:prototxt,caffemodel] | yunet[:model.onnx]
+
+# ---------------- Profiling ----------------
+PROFILE_OVERLAY = False    # draw p50/p95 per stage on the video
+METRICS_FILE = ""          # e.g. "face_metrics.prom" (Prometheus textfile) or "face_metrics.json"
 
 # -----------------------
 # Load known faces
@@ -69,17 +81,27 @@ face_data = {}
 with open(DATA_FILE, "r") as f:
     face_data = json.load(f)
 
+encoding_cache = EncodingCache(ENCODING_CACHE)
+
+def encode_known_face(img_path):
+    image = face_recognition.load_image_file(img_path)
+    return face_recognition.face_encodings(image)
+
 def load_known_faces():
     known_face_encodings.clear()
     known_face_names.clear()
+    present = []
     for name, info in face_data.items():
         img_path = os.path.join(KNOWN_FACE_DIR, info['image'])
         if os.path.exists(img_path):
-            image = face_recognition.load_image_file(img_path)
-            encs = face_recognition.face_encodings(image)
+            present.append(img_path)
+            encs = encoding_cache.get(img_path, encode_known_face)
             if encs:
                 known_face_encodings.append(encs)
                 known_face_names.append(name)
+    # drop cache entries for replaced or deleted images, then persist new encodings
+    encoding_cache.retain(present)
+    encoding_cache.save()
 
 load_known_faces()
 
@@ -87,17 +109,7 @@ load_known_faces()
 # Helpers: quality, alignment, liveness hook
 # -----------------------
 def face_quality_ok(rgb_frame, box):
-    top, right, bottom, left = box
-    w = right - left
-    h = bottom - top
-    if w < MIN_FACE_SIZE or h < MIN_FACE_SIZE:
-        return False
-    face_crop = rgb_frame[top:bottom, left:right]
-    if face_crop.size == 0:
-        return False
-    gray = cv2.cvtColor(face_crop, cv2.COLOR_RGB2GRAY)
-    blur_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-    return blur_var >= MIN_BLUR_VAR
+    return core_quality_ok(rgb_frame, box, MIN_FACE_SIZE, MIN_BLUR_VAR)
 
 def align_face_rough(rgb_frame, box):
     # Rough alignment placeholder: center-crop and resize
@@ -146,6 +158,8 @@ def save_camera_ip():
     CAMERA_URL = camera_var.get().strip()
     with open(IP_FILE, 'w') as f:
         f.write(CAMERA_URL)
+    ip_camera.url = CAMERA_URL
+    ip_camera.start()
     messagebox.showinfo("Saved", "Camera IP saved.")
 btn_ip = Button(frame, text="Save IP", command=save_camera_ip)
 style_button(btn_ip)
@@ -187,20 +201,23 @@ def set_status(text, color=ACCENT):
 # Multi-shot enroll with quality filtering
 def capture_best_face_shots():
     shots = []
+    seen = 0
     deadline = time.time() + 8  # up to 8 seconds window
     while len(shots) < ENROLL_SHOTS and time.time() < deadline:
-        frame = get_frame()
-        if frame is None:
-            continue
+        # wait for a frame we have not looked at yet (no re-detecting the same snapshot)
+        got = ip_camera.read_next(seen, timeout=max(0.0, deadline - time.time()))
+        if got is None:
+            break
+        seen, _, frame = got
         rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        boxes = face_recognition.face_locations(rgb, number_of_times_to_upsample=UPSCALE, model="hog")
+        boxes = detector.detect(rgb)
         encs = face_recognition.face_encodings(rgb, boxes)
         for box, enc in zip(boxes, encs):
             if not face_quality_ok(rgb, box):
                 continue
             aligned = align_face_rough(rgb, box)
-            # Sharpness metric
-            blur = cv2.Laplacian(cv2.cvtColor(aligned, cv2.COLOR_RGB2GRAY), cv2.CV_64F).var()
+            # Sharpness metric (of the original box; already scored by face_quality_ok)
+            blur = sharpness(rgb, box)
             shots.append((blur, aligned, enc, box))
             if len(shots) >= ENROLL_SHOTS:
                 break
@@ -241,36 +258,40 @@ btn_add.grid(row=3, column=1, padx=6, pady=8, sticky="w")
 # -----------------------
 # Recognition loop
 # -----------------------
-marked_attendance = {}  # name -> last_time
+# Rows are queued and written in batches by a background thread (no file I/O on the UI thread)
+attendance = AttendanceSink(ATTENDANCE_FILE, COOLDOWN_SECS)
 current_frame = None
 
 def log_attendance(name):
-    now = datetime.now()
-    last = marked_attendance.get(name)
-    if last and (now - last).total_seconds() < COOLDOWN_SECS:
+    now = attendance.mark(name, face_data[name]['mobile'])
+    if now is None:
         return
-    mobile = face_data[name]['mobile']
-    with open(ATTENDANCE_FILE, "a", newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow([name, mobile, now.strftime("%Y-%m-%d %H:%M:%S")])
-    marked_attendance[name] = now
     set_status(f"{name} marked present at {now.strftime('%H:%M:%S')}", OK)
 
+# Stage timers (capture/decode/detect/encode/match/render), optionally exported to METRICS_FILE
+profiler = Profiler()
+stop_metrics = profiler.start_export(METRICS_FILE) if METRICS_FILE else None
+
+# Face detector backend (DETECTOR); every backend returns (top, right, bottom, left) boxes
+detector = make_detector(DETECTOR, upsample=UPSCALE)
+
+# Background keep-alive reader (shot.jpg or MJPEG /video); get_frame never blocks the UI
+ip_camera = IPCameraReader(CAMERA_URL)
+ip_camera.profiler = profiler
+ip_camera.start()
+
 def get_frame():
-    try:
-        resp = urllib.request.urlopen(CAMERA_URL, timeout=2.5)
-        img_np = np.frombuffer(resp.read(), dtype=np.uint8)
-        return cv2.imdecode(img_np, cv2.IMREAD_COLOR)
-    except Exception:
-        return None
+    return ip_camera.read()
 
 def recognize_and_draw(frame):
     rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    boxes = face_recognition.face_locations(rgb, number_of_times_to_upsample=UPSCALE, model="hog")
+    with profiler.stage("detect"):
+        boxes = detector.detect(rgb)
     if not boxes:
         set_status("No face detected.", WARN)
         return frame
-    encs = face_recognition.face_encodings(rgb, boxes)
+    with profiler.stage("encode"):
+        encs = face_recognition.face_encodings(rgb, boxes)
 
     best_name = None
     best_dist = 1.0
@@ -291,11 +312,12 @@ def recognize_and_draw(frame):
             continue
 
         if known_face_encodings:
-            distances = face_recognition.face_distance(known_face_encodings, enc)
-            i = int(np.argmin(distances))
-            d = float(distances[i])
-            # Secondary margin check: ensure gap to median
-            sorted_d = np.sort(distances)
+            with profiler.stage("match"):
+                distances = face_recognition.face_distance(known_face_encodings, enc)
+                i = int(np.argmin(distances))
+                d = float(distances[i])
+                # Secondary margin check: ensure gap to median
+                sorted_d = np.sort(distances)
             gap = float(sorted_d[14] - sorted_d) if len(sorted_d) > 1 else 1.0
             if d < DIST_THRESHOLD and (gap >= MARGIN):
                 name = known_face_names[i]
@@ -332,13 +354,25 @@ def update_frame():
         return
 
     vis = recognize_and_draw(frame)
-    img_rgb = cv2.cvtColor(vis, cv2.COLOR_BGR2RGB)
-    img_pil = Image.fromarray(img_rgb)
-    imgtk = ImageTk.PhotoImage(image=img_pil)
-    video_label.imgtk = imgtk
-    video_label.configure(image=imgtk)
+    if PROFILE_OVERLAY:
+        profiler.draw(vis, ("capture", "decode", "detect", "encode", "match", "render"))
+    with profiler.stage("render"):
+        img_rgb = cv2.cvtColor(vis, cv2.COLOR_BGR2RGB)
+        img_pil = Image.fromarray(img_rgb)
+        imgtk = ImageTk.PhotoImage(image=img_pil)
+        video_label.imgtk = imgtk
+        video_label.configure(image=imgtk)
+    profiler.tick("render")
     root.after(100, update_frame)
 
-root.protocol("WM_DELETE_WINDOW", root.destroy)
+def on_close():
+    ip_camera.stop()
+    attendance.close()
+    if stop_metrics:
+        stop_metrics()
+        profiler.export(METRICS_FILE)
+    root.destroy()
+
+root.protocol("WM_DELETE_WINDOW", on_close)
 update_frame()
 root.mainloop()
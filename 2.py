@@ -3,16 +3,22 @@ import face_recognition
 import numpy as np
 import os
 import json
-import urllib.request
 import csv
-from datetime import datetime
 from tkinter import Tk, Label, Entry, Button, StringVar, Frame, messagebox
 from PIL import Image, ImageTk
 import time
 
+from camera_reader import IPCameraReader
+from attendance import AttendanceSink
+from face_quality import face_quality_ok as core_quality_ok, sharpness
+from profiling import Profiler
+from face_detectors import make_detector
+from encoding_cache import EncodingCache
+
 # ---------------- Paths & files ----------------
 KNOWN_FACE_DIR = "known_faces"
 DATA_FILE = "face_data.json"
+ENCODING_CACHE = "known_faces.cache.json"   # encodings by image SHA-1; unchanged images are never re-encoded
 ATTENDANCE_FILE = "attendance_log.csv"
 IP_FILE = "camera_ip.txt"
 
@@ -49,6 +55,11 @@ MIN_BLUR_VAR = 120.0       # Laplacian variance threshold
 COOLDOWN_SECS = 120        # per-person cooldown
 ENROLL_SHOTS = 5           # take best of N shots for enrollment
 UPSCALE = 1                # 0/1/2; higher = more detection cost
+DETECTOR = "hog"           # hog | haar | lbp[:cascade.xml] | dnn[:prototxt,caffemodel] | yunet[:model.onnx]
+
+# ---------------- Profiling ----------------
+PROFILE_OVERLAY = False    # draw p50/p95 per stage on the video
+METRICS_FILE = ""          # e.g. "face_metrics.prom" (Prometheus textfile) or "face_metrics.json"
 
 # ---------------- Load known faces ----------------
 known_face_encodings = []
@@ -58,18 +69,28 @@ face_data = {}
 with open(DATA_FILE, "r") as f:
     face_data = json.load(f)
 
+encoding_cache = EncodingCache(ENCODING_CACHE)
+
+def encode_known_face(img_path):
+    image = face_recognition.load_image_file(img_path)
+    return face_recognition.face_encodings(image)
+
 def load_known_faces():
     known_face_encodings.clear()
     known_face_names.clear()
+    present = []
     for name, info in face_data.items():
         img_path = os.path.join(KNOWN_FACE_DIR, info['image'])
         if not os.path.exists(img_path):
             continue
-        image = face_recognition.load_image_file(img_path)
-        encs = face_recognition.face_encodings(image)
+        present.append(img_path)
+        encs = encoding_cache.get(img_path, encode_known_face)
         if encs:
             known_face_encodings.append(encs[0])
             known_face_names.append(name)
+    # drop cache entries for replaced or deleted images, then persist new encodings
+    encoding_cache.retain(present)
+    encoding_cache.save()
 
 load_known_faces()
 
@@ -78,33 +99,33 @@ def set_status(text, color=ACCENT):
     status_var.set(text)
     status_label.configure(fg=color)
 
+# Stage timers (capture/decode/detect/encode/match/render), optionally exported to METRICS_FILE
+profiler = Profiler()
+stop_metrics = profiler.start_export(METRICS_FILE) if METRICS_FILE else None
+
+# Face detector backend (DETECTOR); every backend returns (top, right, bottom, left) boxes
+detector = make_detector(DETECTOR, upsample=UPSCALE)
+
+# Background keep-alive reader (shot.jpg or MJPEG /video); get_frame never blocks the UI
+ip_camera = IPCameraReader(CAMERA_URL)
+ip_camera.profiler = profiler
+ip_camera.start()
+
 def get_frame():
-    # Pull a single JPEG frame from shot.jpg style camera
-    try:
-        resp = urllib.request.urlopen(CAMERA_URL, timeout=2.5)
-        img_np = np.frombuffer(resp.read(), dtype=np.uint8)
-        return cv2.imdecode(img_np, cv2.IMREAD_COLOR)
-    except Exception:
-        return None
+    return ip_camera.read()
 
 def face_quality_ok(rgb_frame, box):
-    top, right, bottom, left = box
-    w, h = right - left, bottom - top
-    if w < MIN_FACE_SIZE or h < MIN_FACE_SIZE:
-        return False
-    crop = rgb_frame[top:bottom, left:right]
-    if crop.size == 0:
-        return False
-    blur = cv2.Laplacian(cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY), cv2.CV_64F).var()
-    return blur >= MIN_BLUR_VAR
+    return core_quality_ok(rgb_frame, box, MIN_FACE_SIZE, MIN_BLUR_VAR)
 
 def recognize_and_draw(frame_bgr):
     rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-    boxes = face_recognition.face_locations(rgb, number_of_times_to_upsample=UPSCALE, model="hog")
+    with profiler.stage("detect"):
+        boxes = detector.detect(rgb)
     if not boxes:
         set_status("No face detected.", WARN)
         return frame_bgr
-    encs = face_recognition.face_encodings(rgb, boxes)
+    with profiler.stage("encode"):
+        encs = face_recognition.face_encodings(rgb, boxes)
 
     best_name, best_dist = None, 1.0
     for box, enc in zip(boxes, encs):
@@ -117,11 +138,12 @@ def recognize_and_draw(frame_bgr):
         name = "Unknown"
         d = 1.0
         if known_face_encodings:
-            distances = face_recognition.face_distance(known_face_encodings, enc)
-            i = int(np.argmin(distances))
-            d = float(distances[i])
-            s = np.sort(distances)
-            gap = float(s[1]-s[0]) if len(s) > 1 else 1.0
+            with profiler.stage("match"):
+                distances = face_recognition.face_distance(known_face_encodings, enc)
+                i = int(np.argmin(distances))
+                d = float(distances[i])
+                s = np.sort(distances)
+                gap = float(s[1]-s[0]) if len(s) > 1 else 1.0
             if d < DIST_THRESHOLD and gap >= MARGIN:
                 name = known_face_names[i]
 
@@ -142,32 +164,33 @@ def recognize_and_draw(frame_bgr):
         set_status(f"Recognized {best_name} (dist {best_dist:.3f})", ACCENT)
     return frame_bgr
 
+# Rows are queued and written in batches by a background thread (no file I/O on the UI thread)
+attendance = AttendanceSink(ATTENDANCE_FILE, COOLDOWN_SECS)
+
 def log_attendance(name):
-    now = datetime.now()
-    last = marked_attendance.get(name)
-    if last and (now - last).total_seconds() < COOLDOWN_SECS:
+    now = attendance.mark(name, face_data[name]['mobile'])
+    if now is None:
         return
-    mobile = face_data[name]['mobile']
-    with open(ATTENDANCE_FILE, "a", newline='') as f:
-        csv.writer(f).writerow([name, mobile, now.strftime("%Y-%m-%d %H:%M:%S")])
-    marked_attendance[name] = now
     set_status(f"{name} marked present at {now.strftime('%H:%M:%S')}", OK)
 
 def capture_best_enroll_shot(timeout_sec=8):
     best = None
+    seen = 0
     deadline = time.time() + timeout_sec
     while time.time() < deadline:
-        frame = get_frame()
-        if frame is None:
-            continue
+        # wait for a frame we have not looked at yet (no re-detecting the same snapshot)
+        got = ip_camera.read_next(seen, timeout=max(0.0, deadline - time.time()))
+        if got is None:
+            break
+        seen, _, frame = got
         rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        boxes = face_recognition.face_locations(rgb, number_of_times_to_upsample=UPSCALE, model="hog")
+        boxes = detector.detect(rgb)
         encs = face_recognition.face_encodings(rgb, boxes)
         for box, enc in zip(boxes, encs):
             if not face_quality_ok(rgb, box):
                 continue
             crop = rgb[box[0]:box[2], box[3]:box[1]]
-            blur = cv2.Laplacian(cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY), cv2.CV_64F).var()
+            blur = sharpness(rgb, box)   # already scored by face_quality_ok
             if (best is None) or (blur > best[0]):
                 best = (blur, crop, enc)
             if best and best[0] > MIN_BLUR_VAR * 2 and (box[2]-box[0]) > MIN_FACE_SIZE*1.2:
@@ -199,6 +222,8 @@ def save_camera_ip():
     CAMERA_URL = camera_var.get().strip()
     with open(IP_FILE, 'w') as f:
         f.write(CAMERA_URL)
+    ip_camera.url = CAMERA_URL
+    ip_camera.start()
     messagebox.showinfo("Saved", "Camera IP saved.")
 btn_ip = Button(top_frame, text="Save IP", command=save_camera_ip)
 style_button(btn_ip); btn_ip.grid(row=0, column=2, padx=6, pady=6)
@@ -255,7 +280,6 @@ video_label = Label(video_frame, bg=BG_PANEL)
 video_label.pack()
 
 # Recognition loop state
-marked_attendance = {}
 
 def update_frame():
     frame = get_frame()
@@ -264,14 +288,26 @@ def update_frame():
         root.after(600, update_frame)
         return
     vis = recognize_and_draw(frame)
-    img_rgb = cv2.cvtColor(vis, cv2.COLOR_BGR2RGB)
-    img_pil = Image.fromarray(img_rgb)
-    imgtk = ImageTk.PhotoImage(image=img_pil)
-    video_label.imgtk = imgtk
-    video_label.configure(image=imgtk)
+    if PROFILE_OVERLAY:
+        profiler.draw(vis, ("capture", "decode", "detect", "encode", "match", "render"))
+    with profiler.stage("render"):
+        img_rgb = cv2.cvtColor(vis, cv2.COLOR_BGR2RGB)
+        img_pil = Image.fromarray(img_rgb)
+        imgtk = ImageTk.PhotoImage(image=img_pil)
+        video_label.imgtk = imgtk
+        video_label.configure(image=imgtk)
+    profiler.tick("render")
     root.after(120, update_frame)
 
-root.protocol("WM_DELETE_WINDOW", root.destroy)
+def on_close():
+    ip_camera.stop()
+    attendance.close()
+    if stop_metrics:
+        stop_metrics()
+        profiler.export(METRICS_FILE)
+    root.destroy()
+
+root.protocol("WM_DELETE_WINDOW", on_close)
 set_status("Ready", ACCENT)
 update_frame()
 root.mainloop()
@@ -12,16 +12,35 @@ import numpy as np
 import os
 import json
 import csv
-import threading
 import time
-from datetime import datetime
+import queue
 from tkinter import Tk, Label, Entry, Button, StringVar, Frame, messagebox, OptionMenu
-from PIL import Image, ImageTk
+
+from gallery_index import GalleryIndex
+from ann_index import IVFPQIndex
+from embedding_store import EmbeddingStore
+from recognition_pipeline import RecognitionPipeline
+from encode_pool import EncodePool
+from face_tracker import FaceTracker
+from motion_gate import MotionGate
+from adaptive_controller import AdaptiveController
+from camera_reader import CameraReader
+from attendance import AttendanceSink
+from cooldown_store import CooldownStore
+from face_core import face_quality_ok as core_quality_ok
+from frame_pool import FramePool, FrameRenderer
+from enrollment import EnrollmentJob
+from profiling import Profiler
+from roi_detect import RoiDetector
+from face_detectors import make_detector
+from file_watcher import FileWatcher
 
 # ---------------- Paths & files ----------------
 KNOWN_FACE_DIR = "known_faces"
-DATA_FILE = "face_data.json"           # { name: {mobile, image, enc:[128]} }
+DATA_FILE = "face_data.json"           # legacy { name: {mobile, image, enc:[128]} }, migrated once
+STORE_BASE = os.path.splitext(DATA_FILE)[0]   # face_data.f32 (memmap) + face_data.meta.jsonl
 ATTENDANCE_FILE = "attendance_log.csv"
+COOLDOWN_DB = "attendance_cooldown.db"   # cooldown shared with other camera processes / restarts
 
 os.makedirs(KNOWN_FACE_DIR, exist_ok=True)
 if not os.path.exists(DATA_FILE):
@@ -44,7 +63,45 @@ COOLDOWN_SECS = 120
 UPSCALE = 0                 # 0 or 1 is usually enough when downscaling
 DOWNSCALE = 0.5             # run detection/encoding at 50% size, then map boxes
 RECOG_INTERVAL_MS = 250     # compute recognition at most every 250 ms
+ADAPTIVE_PERF = True        # adapt DOWNSCALE / RECOG_INTERVAL_MS to this machine (False = fixed)
+TARGET_RECOG_MS = 150       # recognition latency the adaptive controller aims for
+RECOG_WORKERS = 1           # detection/encoding threads off the Tk loop
+ENCODE_PROCESSES = 0        # >1: encode crowded frames on a process pool (0 = in-process)
 ENROLL_TIMEOUT_SEC = 8
+ENROLL_SHOTS = 5            # sharpest shots averaged into the enrolled embedding
+TRACK_TTL_SECS = 1.0        # forget a face track after this long unseen
+TRACK_REENCODE_IOU = 0.5    # re-encode a track when its box overlaps its last encoded box less than this
+TRACK_REVERIFY_SECS = 3.0   # re-encode a still track at least this often
+
+# ---------------- Motion gate (idle camera) ----------------
+MOTION_GATE = True          # skip detection while the scene is static
+MOTION_PIXEL_THRESH = 12    # grey-level change that counts a thumbnail pixel as changed
+MOTION_AREA_FRAC = 0.002    # fraction of changed pixels that counts as motion
+MOTION_HOLD_SECS = 1.5      # keep detecting this long after the last motion
+MOTION_REFRESH_SECS = 30.0  # force a detection at least this often anyway
+
+# ---------------- Detection region ----------------
+DETECTOR = "hog"            # hog | haar | lbp[:cascade.xml] | dnn[:prototxt,caffemodel] | yunet[:model.onnx]
+ROI_STATIC = None           # (x0, y0, x1, y1) frame fractions to search, e.g. (0.25, 0.1, 0.75, 0.95); None = all
+ROI_TRACK_PAD = 0.6         # search window around each tracked face, per side, as a fraction of its size
+ROI_FULL_SCAN_SECS = 1.0    # rescan the whole region this often for new arrivals
+
+# ---------------- Profiling ----------------
+PROFILE = True              # per-stage timers (capture/convert/detect/quality/encode/match/draw/render)
+PROFILE_OVERLAY = False     # draw p50/p95 per stage on the video
+PROFILE_STAGES = ("capture", "convert", "detect", "quality", "encode", "match", "draw", "render")
+METRICS_FILE = ""           # e.g. "face_metrics.prom" (Prometheus textfile) or "face_metrics.json"
+METRICS_EVERY_SECS = 10
+
+# ---------------- Large galleries (optional ANN index) ----------------
+USE_ANN_INDEX = False       # switch to IVF-PQ approximate search for big galleries
+ANN_MIN_GALLERY = 100000    # only worth it past this many identities
+ANN_NPROBE = 8              # buckets scanned per query: higher = better recall, slower
+ANN_FILE = os.path.splitext(DATA_FILE)[0] + ".ivfpq.npz"
+
+# ---------------- Gallery hot-reload ----------------
+GALLERY_WATCH = True        # follow enrollments/removals other processes or machines write to the store
+GALLERY_POLL_SECS = 2.0     # mtime poll interval; inotify (Linux, local disks) reacts sooner
 
 # ---------------- Helpers: robust embedding conversion ----------------
 def as_list128(x):
@@ -65,15 +122,14 @@ def as_np128(x):
     return np.array(x, dtype=np.float32)
 
 # ---------------- Data model ----------------
-with open(DATA_FILE, "r") as f:
-    face_data = json.load(f)
+store = EmbeddingStore(STORE_BASE)
+face_data = store.records   # name -> {mobile, image, row}
 
-known_face_encodings = []
-known_face_names = []
+gallery = GalleryIndex()
 
-def ensure_embedding_cached():
+def ensure_embedding_cached(face_data):
     """
-    Ensure each entry has a cached embedding at face_data[name]['enc'] (list of 128).
+    Ensure each legacy JSON entry has a cached embedding at face_data[name]['enc'] (list of 128).
     Drops entries with missing/bad images.
     """
     changed = False
@@ -109,93 +165,89 @@ def ensure_embedding_cached():
         with open(DATA_FILE, "w") as f:
             json.dump(face_data, f, indent=2)
 
+def migrate_legacy_json():
+    """
+    One-time import of face_data.json into the binary store. Runs only while
+    the store has never been written; later enrollments go to the store.
+    """
+    if store.exists():
+        return
+    with open(DATA_FILE, "r") as f:
+        legacy = json.load(f)
+    ensure_embedding_cached(legacy)
+    n = store.migrate_from_json(DATA_FILE)
+    print(f"Migrated {n} faces from {DATA_FILE} to {store.vec_path}")
+
 def load_known_faces():
-    known_face_encodings.clear()
-    known_face_names.clear()
-    for name, info in face_data.items():
-        enc = info.get('enc')
-        if enc and len(enc) == 128:
-            known_face_encodings.append(as_np128(enc))
-            known_face_names.append(name)
+    """
+    Sync the gallery index with the store: add/update embeddings straight from
+    the memmap and drop names that are no longer present.
+    """
+    for name in gallery.names:
+        if name not in face_data:
+            gallery.remove(name)
+    names = list(face_data.keys())
+    if names:
+        rows = [face_data[n]['row'] for n in names]
+        gallery.add_many(names, store.vectors()[rows])
+
+def load_ann_matcher():
+    """
+    Return the matcher used by recognition: the exact gallery, or an IVF-PQ
+    index (loaded from ANN_FILE and synced, or trained) for very large galleries.
+    """
+    if not USE_ANN_INDEX or len(gallery) < ANN_MIN_GALLERY:
+        return gallery
+    if os.path.exists(ANN_FILE):
+        ann = IVFPQIndex.load(ANN_FILE)
+        current = set(gallery.names)
+        for name in ann.names:
+            if name not in current:
+                ann.remove(name)
+        # upsert names that are new or whose embedding changed while the app was down
+        names, mat = gallery.names, gallery.matrix()
+        held = [i for i, n in enumerate(names) if n in ann]
+        saved = ann.vectors([names[i] for i in held])
+        stale = {names[i] for i, v in zip(held, saved) if not np.allclose(v, mat[i], atol=1e-6)}
+        todo = [i for i, n in enumerate(names) if n not in ann or n in stale]
+        if todo:
+            ann.add_many([names[i] for i in todo], mat[todo])
+    else:
+        ann = IVFPQIndex.build(gallery.names, gallery.matrix())
+    ann.nprobe = ANN_NPROBE
+    ann.save(ANN_FILE)
+    return ann
 
-ensure_embedding_cached()
+def apply_store_changes():
+    """
+    Watcher thread: apply only the identities added, changed or removed in the
+    store since the last look to the live gallery (and ANN index). Each index
+    takes the whole diff under its lock, so recognition keeps running and never
+    sees half of an update.
+    """
+    changed, removed = store.refresh()
+    if not changed and not removed:
+        return
+    names = list(changed)
+    vecs = np.asarray(store.vectors()[[changed[n] for n in names]]) if names else np.zeros((0, 128), np.float32)
+    gallery.apply(names, vecs, removed)
+    if matcher is not gallery:
+        matcher.apply(names, vecs, removed)
+    tracker.forget_identities(names + list(removed))
+    print(f"[gallery] {len(names)} added/updated, {len(removed)} removed ({store.meta_path})")
+
+migrate_legacy_json()
 load_known_faces()
-
-# ---------------- Camera reader ----------------
-class CameraReader:
-    def __init__(self, index=0, width=1280, height=720):
-        self.index = index
-        self.width = width
-        self.height = height
-        self.cap = None
-        self.running = False
-        self.frame_lock = threading.Lock()
-        self.latest_frame = None
-        self.thread = None
-
-    def start(self):
-        self.stop()
-        backend = cv2.CAP_DSHOW if hasattr(cv2, 'CAP_DSHOW') else 0
-        self.cap = cv2.VideoCapture(self.index, backend)
-        # Best-effort tuning
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
-        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
-        self.running = True
-        self.thread = threading.Thread(target=self._loop, daemon=True)
-        self.thread.start()
-
-    def _loop(self):
-        consecutive_fail = 0
-        while self.running:
-            if not self.cap:
-                time.sleep(0.02)
-                continue
-            ok, frame = self.cap.read()
-            if not ok:
-                consecutive_fail += 1
-                if consecutive_fail > 30:
-                    self._reopen()
-                    consecutive_fail = 0
-                time.sleep(0.01)
-                continue
-            consecutive_fail = 0
-            with self.frame_lock:
-                self.latest_frame = frame
-            time.sleep(0.002)
-
-    def _reopen(self):
-        try:
-            if self.cap:
-                self.cap.release()
-        except Exception:
-            pass
-        time.sleep(0.15)
-        backend = cv2.CAP_DSHOW if hasattr(cv2, 'CAP_DSHOW') else 0
-        self.cap = cv2.VideoCapture(self.index, backend)
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
-        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
-
-    def read(self):
-        with self.frame_lock:
-            if self.latest_frame is None:
-                return None
-            return self.latest_frame.copy()
-
-    def stop(self):
-        self.running = False
-        if self.thread and self.thread.is_alive():
-            self.thread.join(timeout=0.5)
-        self.thread = None
-        try:
-            if self.cap:
-                self.cap.release()
-        except Exception:
-            pass
-        self.cap = None
+matcher = load_ann_matcher()
+gallery_watcher = None
+if GALLERY_WATCH:
+    gallery_watcher = FileWatcher([store.meta_path, store.vec_path], apply_store_changes,
+                                  poll_secs=GALLERY_POLL_SECS).start()
 
 camera = CameraReader(index=0)
+profiler = Profiler(enabled=PROFILE)
+camera.profiler = profiler
+stop_metrics = profiler.start_export(METRICS_FILE, METRICS_EVERY_SECS) if METRICS_FILE else None
 
 # ---------------- UI helpers ----------------
 def set_status(text, color=ACCENT):
@@ -203,31 +255,15 @@ def set_status(text, color=ACCENT):
     status_label.configure(fg=color)
 
 def face_quality_ok(rgb_frame, box):
-    top, right, bottom, left = box
-    w, h = right - left, bottom - top
-    if w < MIN_FACE_SIZE or h < MIN_FACE_SIZE:
-        return False
-    crop = rgb_frame[top:bottom, left:right]
-    if crop.size == 0:
-        return False
-    blur = cv2.Laplacian(cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY), cv2.CV_64F).var()
-    return blur >= MIN_BLUR_VAR
-
-def map_boxes(scale, boxes):
-    if scale == 1.0:
-        return boxes
-    mapped = []
-    inv = 1.0 / scale
-    for (t, r, b, l) in boxes:
-        mapped.append((int(t*inv), int(r*inv), int(b*inv), int(l*inv)))
-    return mapped
+    return core_quality_ok(rgb_frame, box, MIN_FACE_SIZE, MIN_BLUR_VAR)
 
 # ---------------- Recognition state ----------------
-last_recog_ts = 0
 overlay_state = {'boxes': [], 'names': [], 'distances': []}
-marked_attendance = {}
+cooldowns = CooldownStore(COOLDOWN_DB, COOLDOWN_SECS)
+cooldowns.seed_from_csv(ATTENDANCE_FILE)   # tail only: rows still inside the cooldown
+attendance = AttendanceSink(ATTENDANCE_FILE, COOLDOWN_SECS, cooldown_store=cooldowns)
 
-def draw_overlay(rgb_full, frame_bgr):
+def draw_overlay(frame_bgr):
     for (box, name, d) in zip(overlay_state['boxes'], overlay_state['names'], overlay_state['distances']):
         t, r, b, l = box
         if name == "LowQ":
@@ -246,88 +282,101 @@ def draw_overlay(rgb_full, frame_bgr):
     return frame_bgr
 
 def log_attendance(name):
-    now = datetime.now()
-    last = marked_attendance.get(name)
-    if last and (now - last).total_seconds() < COOLDOWN_SECS:
+    info = face_data.get(name)
+    if info is None:
+        return   # removed from the store since this frame was matched
+    now = attendance.mark(name, info['mobile'])
+    if now is None:
         return
-    mobile = face_data[name]['mobile']
-    with open(ATTENDANCE_FILE, "a", newline='') as f:
-        csv.writer(f).writerow([name, mobile, now.strftime("%Y-%m-%d %H:%M:%S")])
-    marked_attendance[name] = now
     set_status(f"{name} marked present at {now.strftime('%H:%M:%S')}", OK)
 
-def recognize_and_draw(frame_bgr):
-    global last_recog_ts
-    rgb_full = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-    now_ms = int(time.time() * 1000)
-    need_recog = (now_ms - last_recog_ts) >= RECOG_INTERVAL_MS
-    if not need_recog:
-        return draw_overlay(rgb_full, frame_bgr)
-
-    # Downscaled detection for speed
-    if DOWNSCALE != 1.0:
-        small_rgb = cv2.resize(rgb_full, (0, 0), fx=DOWNSCALE, fy=DOWNSCALE)
-    else:
-        small_rgb = rgb_full
-
-    boxes_small = face_recognition.face_locations(
-        small_rgb, number_of_times_to_upsample=UPSCALE, model="hog"
-    )
-    boxes = map_boxes(DOWNSCALE, boxes_small)
-    encs = face_recognition.face_encodings(rgb_full, boxes) if boxes else []
-
-    overlay_state['boxes'] = boxes
-    overlay_state['names'] = []
-    overlay_state['distances'] = []
-
-    for box, enc in zip(boxes, encs):
-        if not face_quality_ok(rgb_full, box):
-            overlay_state['names'].append("LowQ")
-            overlay_state['distances'].append(1.0)
+def recognize(frame_bgr):
+    """
+    Detect, encode and match one frame. Runs on a pipeline worker thread,
+    so it must not touch Tk; the UI applies the result in recognize_and_draw.
+    Returns None when the motion gate skipped detection (overlay stays as is).
+    """
+    job = enroll_job
+    enrolling = job is not None and not job.done
+    if gate and not enrolling and not gate.should_detect(frame_bgr):
+        return None
+    t_start = time.perf_counter()
+    profiler.tick("recog")
+
+    with profiler.stage("convert"):
+        rgb_full = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+
+    # Downscaled detection (scale picked by the adaptive controller), only inside
+    # the static region and around live tracks between periodic full scans
+    now = time.time()
+    with profiler.stage("detect"):
+        boxes = roi.detect(rgb_full, controller.scale, tracker.boxes(), now)
+    tracks = tracker.update(boxes, now)
+
+    # Quality gate first; only new, moved or due-for-reverify tracks are encoded,
+    # then matched against the gallery in one batch
+    with profiler.stage("quality"):
+        good = [face_quality_ok(rgb_full, box) for box in boxes]
+    todo = [i for i, (t, ok) in enumerate(zip(tracks, good)) if ok and tracker.needs_encoding(t, now)]
+    encoded = {}
+    if todo:
+        todo_boxes = [boxes[i] for i in todo]
+        with profiler.stage("encode"):
+            encs = encoder.encode(rgb_full, todo_boxes) if encoder else face_recognition.face_encodings(rgb_full, todo_boxes)
+        encoded = dict(zip(todo, encs))
+        with profiler.stage("match"):
+            matches = matcher.match(encs, DIST_THRESHOLD, MARGIN)
+        for i, (name, d) in zip(todo, matches):
+            tracks[i].set_identity(name, d, now)
+
+    # Enrollment reuses this pass's detection: offer the largest good face to the job
+    if enrolling:
+        cand = [i for i, ok in enumerate(good) if ok]
+        if cand:
+            i = max(cand, key=lambda j: (boxes[j][2] - boxes[j][0]) * (boxes[j][1] - boxes[j][3]))
+            enc = encoded.get(i)
+            if enc is None:
+                enc = face_recognition.face_encodings(rgb_full, [boxes[i]])[0]
+            job.offer(rgb_full, boxes[i], enc, now)
+
+    result = {'boxes': boxes, 'names': [], 'distances': [], 'track_ids': [t.id for t in tracks]}
+    for t, ok in zip(tracks, good):
+        if not ok or t.name is None:
+            result['names'].append("LowQ")
+            result['distances'].append(1.0)
             continue
+        result['names'].append(t.name)
+        result['distances'].append(t.distance)
+
+    controller.observe((time.perf_counter() - t_start) * 1000.0)
+    pipeline.min_interval_ms = controller.interval_ms
+    return result
+
+enroll_job = None   # EnrollmentJob while "Add Face" is collecting shots
+controller = AdaptiveController(scale=DOWNSCALE, interval_ms=RECOG_INTERVAL_MS,
+                                target_ms=TARGET_RECOG_MS, fixed=not ADAPTIVE_PERF)
+roi = RoiDetector(ROI_STATIC, pad=ROI_TRACK_PAD, full_scan_secs=ROI_FULL_SCAN_SECS,
+                  detector=make_detector(DETECTOR, upsample=UPSCALE))
+tracker = FaceTracker(ttl_secs=TRACK_TTL_SECS, reencode_iou=TRACK_REENCODE_IOU, reverify_secs=TRACK_REVERIFY_SECS)
+gate = MotionGate(pixel_thresh=MOTION_PIXEL_THRESH, area_frac=MOTION_AREA_FRAC,
+                  hold_secs=MOTION_HOLD_SECS, refresh_secs=MOTION_REFRESH_SECS) if MOTION_GATE else None
+encoder = EncodePool(workers=ENCODE_PROCESSES) if ENCODE_PROCESSES > 1 else None
+pipeline = RecognitionPipeline(recognize, workers=RECOG_WORKERS, min_interval_ms=RECOG_INTERVAL_MS)
+camera.on_frame = pipeline.submit
 
-        name = "Unknown"; d = 1.0
-        if known_face_encodings:
-            distances = face_recognition.face_distance(known_face_encodings, enc)
-            i = int(np.argmin(distances))
-            d = float(distances[i])
-            s = np.sort(distances)
-            gap = float(s[1]-s[0]) if len(s) > 1 else 1.0
-            if d < DIST_THRESHOLD and gap >= MARGIN:
-                name = known_face_names[i]
-
-        overlay_state['names'].append(name)
-        overlay_state['distances'].append(d)
-        if name != "Unknown":
-            log_attendance(name)
-
-    last_recog_ts = now_ms
-    return draw_overlay(rgb_full, frame_bgr)
-
-def capture_best_enroll_shot(timeout_sec=ENROLL_TIMEOUT_SEC):
-    best = None
-    deadline = time.time() + timeout_sec
-    while time.time() < deadline:
-        frame = camera.read()
-        if frame is None:
-            time.sleep(0.02)
-            continue
-        rgb_full = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        small = cv2.resize(rgb_full, (0, 0), fx=DOWNSCALE, fy=DOWNSCALE)
-        boxes_small = face_recognition.face_locations(small, number_of_times_to_upsample=UPSCALE, model="hog")
-        boxes = map_boxes(DOWNSCALE, boxes_small)
-        encs = face_recognition.face_encodings(rgb_full, boxes)
-        for box, enc in zip(boxes, encs):
-            if not face_quality_ok(rgb_full, box):
-                continue
-            t, r, b, l = box
-            crop = rgb_full[t:b, l:r]
-            blur = cv2.Laplacian(cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY), cv2.CV_64F).var()
-            if (best is None) or (blur > best[0]):
-                best = (blur, crop, enc)
-            if best and best[0] > MIN_BLUR_VAR * 2 and (b - t) > int(MIN_FACE_SIZE * 1.2):
-                return best
-    return best
+def recognize_and_draw(frame_bgr):
+    """UI side: pick up the newest finished recognition (if any) and draw it."""
+    result = pipeline.poll()
+    if result is not None:
+        overlay_state.update(result)
+        for name in result['names']:
+            if name not in ("Unknown", "LowQ"):
+                log_attendance(name)
+    with profiler.stage("draw"):
+        draw_overlay(frame_bgr)
+        if PROFILE_OVERLAY:
+            profiler.draw(frame_bgr, PROFILE_STAGES)
+    return frame_bgr
 
 # ---------------- Tkinter UI ----------------
 root = Tk()
@@ -355,10 +404,17 @@ def start_camera():
         idx = 0
     camera.index = idx
     camera.start()
+    pipeline.start()
     set_status(f"Camera started (index {idx})", OK)
 
 def stop_camera():
+    if enroll_job is not None:
+        enroll_job.cancel()
     camera.stop()
+    pipeline.stop()
+    if gate:
+        gate.reset()
+    overlay_state.update({'boxes': [], 'names': [], 'distances': []})
     set_status("Camera stopped", WARN)
 
 btn_start = Button(top_frame, text="Start Camera", command=start_camera); style_button(btn_start); btn_start.grid(row=0, column=2, padx=6, pady=6)
@@ -373,28 +429,58 @@ lbl_mobile = Label(top_frame, text="Mobile:"); style_label(lbl_mobile); lbl_mobi
 mobile_var = StringVar()
 ent_mobile = Entry(top_frame, textvariable=mobile_var, width=30); style_entry(ent_mobile); ent_mobile.grid(row=2, column=1, padx=6, pady=6, sticky="w")
 
-# Add face button
+# Add face button: starts an EnrollmentJob that the recognition worker feeds;
+# poll_enrollment drains its progress queue on the Tk loop
 def add_face_button():
+    global enroll_job
     if not camera.running:
         messagebox.showerror("Camera", "Start the camera first."); return
+    if enroll_job is not None and not enroll_job.done:
+        messagebox.showinfo("Enrollment", "Enrollment already in progress."); return
     name = name_var.get().strip()
     mobile = mobile_var.get().strip()
     if not name or not mobile:
         messagebox.showerror("Missing Data", "Enter both Name and Mobile."); return
-    set_status("Capturing best face shot...", WARN)
-    best = capture_best_enroll_shot()
-    if not best:
-        messagebox.showerror("Quality", "No high-quality face captured. Improve lighting and try again.")
-        set_status("Enrollment failed: low quality", ERR); return
-    blur, crop_rgb, enc = best
-    filename = f"{name}_{int(time.time())}.jpg"
-    cv2.imwrite(os.path.join(KNOWN_FACE_DIR, filename), cv2.cvtColor(crop_rgb, cv2.COLOR_RGB2BGR))
-    # Update data model with cached embedding (SAFE: only tolist if array)
-    face_data[name] = {"mobile": mobile, "image": filename, "enc": as_list128(enc)}
-    with open(DATA_FILE, "w") as f:
-        json.dump(face_data, f, indent=2)
-    load_known_faces()
-    set_status(f"{name} enrolled (sharpness {blur:.1f}).", OK)
+    enroll_job = EnrollmentJob(name, mobile, shots=ENROLL_SHOTS, timeout_secs=ENROLL_TIMEOUT_SEC,
+                               good_blur=MIN_BLUR_VAR * 2)
+    btn_add.configure(state="disabled")
+    set_status(f"Enrolling {name}: look at the camera...", WARN)
+    root.after(100, poll_enrollment, enroll_job)
+
+def poll_enrollment(job):
+    job.check_timeout()
+    while True:
+        try:
+            msg = job.progress.get_nowait()
+        except queue.Empty:
+            break
+        if msg[0] == "progress":
+            _, kept, wanted, blur = msg
+            set_status(f"Enrolling {job.name}: {kept}/{wanted} shots (sharpness {blur:.0f})", WARN)
+        elif msg[0] == "failed":
+            btn_add.configure(state="normal")
+            if msg[1] != "cancelled":
+                messagebox.showerror("Quality", "No high-quality face captured. Improve lighting and try again.")
+            set_status(f"Enrollment failed: {msg[1]}", ERR)
+            return
+        elif msg[0] == "done":
+            save_enrollment(job, msg[1])
+            return
+    root.after(100, poll_enrollment, job)
+
+def save_enrollment(job, result):
+    filename = f"{job.name}_{int(time.time())}.jpg"
+    cv2.imwrite(os.path.join(KNOWN_FACE_DIR, filename), cv2.cvtColor(result['crop'], cv2.COLOR_RGB2BGR))
+    centroid = as_np128(result['centroid'])
+    # O(1) append to the binary store (centroid row + per-shot rows + metadata line)
+    store.append(job.name, job.mobile, filename, centroid, shots=result['encodings'])
+    gallery.add(job.name, centroid)
+    if matcher is not gallery:
+        matcher.add(job.name, centroid)
+    tracker.forget_identities([job.name])
+    btn_add.configure(state="normal")
+    set_status(f"{job.name} enrolled from {len(result['encodings'])} shots "
+               f"(best sharpness {result['blur']:.1f}).", OK)
     name_var.set(""); mobile_var.set("")
 
 btn_add = Button(top_frame, text="Add Face", command=add_face_button); style_button(btn_add); btn_add.grid(row=3, column=1, padx=6, pady=8, sticky="w")
@@ -403,6 +489,9 @@ btn_add = Button(top_frame, text="Add Face", command=add_face_button); style_but
 status_var = StringVar()
 status_label = Label(root, textvariable=status_var, bg=BG, fg=ACCENT, font=("Segoe UI", 12, "bold"))
 status_label.pack(pady=6)
+perf_var = StringVar()
+perf_label = Label(root, textvariable=perf_var, bg=BG, fg=FG, font=("Consolas", 9))
+perf_label.pack()
 
 # Video panel
 video_frame = Frame(root, bg=BG_PANEL, bd=0, highlightthickness=1, highlightbackground=ACCENT)
@@ -410,30 +499,59 @@ video_frame.pack(padx=10, pady=10)
 video_label = Label(video_frame, bg=BG_PANEL)
 video_label.pack()
 
+# Render path: camera frame is copied into a pooled buffer, drawn on in place,
+# converted to RGB once and pasted into a reused PhotoImage (no per-frame allocations)
+frame_pool = FramePool()
+renderer = FrameRenderer(video_label)
+STOPPED_FRAME = np.zeros((360, 640, 3), dtype=np.uint8)
+cv2.putText(STOPPED_FRAME, "Camera stopped. Click 'Start Camera'.", (20, 180),
+            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200, 200, 200), 1, cv2.LINE_AA)
+WAITING_FRAME = np.zeros((360, 640, 3), dtype=np.uint8)
+shown_seq = 0   # sequence number of the camera frame on screen
+
 def update_frame():
+    global shown_seq
     if not camera.running:
-        blank = np.zeros((360, 640, 3), dtype=np.uint8)
-        cv2.putText(blank, "Camera stopped. Click 'Start Camera'.", (20, 180),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200, 200, 200), 1, cv2.LINE_AA)
-        img_rgb = cv2.cvtColor(blank, cv2.COLOR_BGR2RGB)
+        vis = STOPPED_FRAME
     else:
-        frame = camera.read()
-        if frame is None:
-            set_status("Waiting for camera frames...", WARN)
-            img_rgb = np.zeros((360, 640, 3), dtype=np.uint8)
-        else:
-            vis = recognize_and_draw(frame)
-            img_rgb = cv2.cvtColor(vis, cv2.COLOR_BGR2RGB)
-
-    img_pil = Image.fromarray(img_rgb)
-    imgtk = ImageTk.PhotoImage(image=img_pil)
-    video_label.imgtk = imgtk
-    video_label.configure(image=imgtk)
+        got = camera.read_next(shown_seq, timeout=0, pool=frame_pool)
+        if got is None:
+            if camera.latest_frame is None:
+                set_status("Waiting for camera frames...", WARN)
+                renderer.show(WAITING_FRAME)
+            root.after(40, update_frame)   # no new frame yet: keep what is on screen
+            return
+        shown_seq, _, frame = got
+        vis = recognize_and_draw(frame)
+        st = pipeline.stats()
+        lat = st['latency_ms']
+        perf_var.set(f"queue {lat['queue']['avg']:.0f}ms | recog {lat['process']['avg']:.0f}ms "
+                     f"(p95 {lat['process']['p95']:.0f}) | ui {lat['deliver']['avg']:.0f}ms | "
+                     f"scale {controller.scale:.2f} every {controller.interval_ms}ms | "
+                     f"depth {st['queue_depth']} | dropped {st['dropped_frames']} | errors {st['errors']} | "
+                     f"encoded {tracker.encoded} reused {tracker.reused} | roi {roi.scanned_frac * 100:.0f}%"
+                     + (f" | idle-skipped {gate.skipped}/{gate.checked}" if gate else ""))
+
+    with profiler.stage("render"):
+        renderer.show(vis)
+    profiler.tick("render")
     root.after(40, update_frame)
 
 def on_close():
     try: camera.stop()
     except Exception: pass
+    pipeline.stop()
+    if gallery_watcher:
+        gallery_watcher.stop()
+    if encoder:
+        encoder.close()
+    if matcher is not gallery:
+        matcher.save(ANN_FILE)
+    attendance.close()
+    cooldowns.close()
+    if stop_metrics:
+        stop_metrics()
+        profiler.export(METRICS_FILE)
     root.destroy()
 
 root.protocol("WM_DELETE_WINDOW", on_close)
@@ -0,0 +1,74 @@
+import threading
+import time
+
+
+class AdaptiveController:
+    """
+    Feedback loop for detection scale and recognition cadence.
+
+    observe() is fed the wall time of every recognition pass. An EMA of that
+    latency is held near `target_ms` by stepping through `scales` (smaller
+    detection image = faster) and the recognition interval is set so the
+    worker stays busy at most `max_duty` of the time (frame budget for
+    capture/UI on small CPUs). When the machine has headroom the scale is
+    stepped back up for accuracy. With fixed=True the initial settings are
+    returned unchanged (override for kiosks that must not adapt).
+    """
+
+    def __init__(self, scale=0.5, interval_ms=250, target_ms=150.0, scales=(1.0, 0.75, 0.5, 0.4, 0.33),
+                 min_interval_ms=100, max_interval_ms=1500, max_duty=0.6, smoothing=0.2,
+                 settle_ticks=8, fixed=False, log=print):
+        self.scales = sorted(scales, reverse=True)
+        self.scale = min(self.scales, key=lambda s: abs(s - scale))
+        self.interval_ms = interval_ms
+        self.target_ms = target_ms
+        self.min_interval_ms = min_interval_ms
+        self.max_interval_ms = max_interval_ms
+        self.max_duty = max_duty
+        self.smoothing = smoothing
+        self.settle_ticks = settle_ticks
+        self.fixed = fixed
+        self.log = log
+        self.latency_ms = None
+        self.adjustments = 0
+        self._since_change = 0
+        self._lock = threading.Lock()
+
+    def observe(self, latency_ms):
+        if self.fixed:
+            return
+        with self._lock:
+            if self.latency_ms is None:
+                self.latency_ms = latency_ms
+            else:
+                self.latency_ms += self.smoothing * (latency_ms - self.latency_ms)
+            self._since_change += 1
+            if self._since_change < self.settle_ticks:
+                return   # let the EMA settle after each change
+            lat = self.latency_ms
+            i = self.scales.index(self.scale)
+            new_scale = self.scale
+            if lat > self.target_ms * 1.15 and i + 1 < len(self.scales):
+                new_scale = self.scales[i + 1]
+            elif lat < self.target_ms * 0.55 and i > 0:
+                # estimate cost at the bigger scale (~ pixel count) before stepping up
+                up = self.scales[i - 1]
+                if lat * (up / self.scale) ** 2 < self.target_ms:
+                    new_scale = up
+            new_interval = int(min(self.max_interval_ms, max(self.min_interval_ms, lat / self.max_duty)))
+            changed_scale = new_scale != self.scale
+            changed_interval = abs(new_interval - self.interval_ms) >= max(20, 0.1 * self.interval_ms)
+            if not (changed_scale or changed_interval):
+                return
+            msg = f"latency {lat:.0f}ms (target {self.target_ms:.0f}): "
+            if changed_scale:
+                msg += f"scale {self.scale:.2f}->{new_scale:.2f} "
+                self.scale = new_scale
+                self.latency_ms = None   # old samples were for the old scale
+            if changed_interval:
+                msg += f"interval {self.interval_ms}->{new_interval}ms"
+                self.interval_ms = new_interval
+            self.adjustments += 1
+            self._since_change = 0
+        if self.log:
+            self.log(f"[adaptive {time.strftime('%H:%M:%S')}] {msg.strip()}")
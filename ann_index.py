@@ -0,0 +1,298 @@
+import threading
+
+import numpy as np
+
+from gallery_index import EMBED_DIM
+
+
+def kmeans(x, k, iters=20, seed=0):
+    """Plain Lloyd's k-means in NumPy. Returns (k, d) float32 centroids."""
+    x = np.asarray(x, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    k = min(k, len(x))
+    cent = x[rng.choice(len(x), k, replace=False)].copy()
+    xsq = np.einsum("ij,ij->i", x, x)
+    for _ in range(iters):
+        d = xsq[:, None] - 2.0 * (x @ cent.T) + np.einsum("ij,ij->i", cent, cent)[None, :]
+        assign = np.argmin(d, axis=1)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(cent)
+        np.add.at(sums, assign, x)
+        empty = counts == 0
+        cent[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            # re-seed dead centroids from random points
+            cent[empty] = x[rng.choice(len(x), int(empty.sum()), replace=False)]
+    return cent
+
+
+def _nearest(x, cent):
+    d = np.einsum("ij,ij->i", cent, cent)[None, :] - 2.0 * (x @ cent.T)
+    return np.argmin(d, axis=1)
+
+
+class IVFPQIndex:
+    """
+    Approximate gallery for very large enrollments (~100k+ people).
+
+    Embeddings are bucketed by a coarse k-means quantizer (IVF, `nlist`
+    buckets) and each residual is compressed to `m` one-byte product-quantizer
+    codes. A query only scans the `nprobe` closest buckets using per-subspace
+    lookup tables, then the best `rerank` candidates are re-scored exactly so
+    distances stay comparable to DIST_THRESHOLD.
+
+    Recall/latency knobs: raise `nprobe` (more buckets scanned) or `rerank`
+    (more exact re-scoring) for recall, lower them for speed.
+    Same add/remove/match surface as GalleryIndex so the apps can swap it in.
+    """
+
+    def __init__(self, dim=EMBED_DIM, nlist=256, m=16, nbits=8, nprobe=8, rerank=32):
+        if dim % m:
+            raise ValueError("dim must be divisible by m")
+        self.dim = dim
+        self.nlist = nlist
+        self.m = m
+        self.ksub = 1 << nbits
+        self.nprobe = nprobe
+        self.rerank = rerank
+        self.coarse = None      # (nlist, dim)
+        self.codebooks = None   # (m, ksub, dsub)
+        self._bucket_tab = None # (nlist, m, ksub) = 2<c_j, b_jk> + |b_jk|^2
+        self._vecs = np.zeros((0, dim), dtype=np.float32)
+        self._codes = np.zeros((0, m), dtype=np.uint8)
+        self._bucket = np.zeros(0, dtype=np.int32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._names = []
+        self._rows = {}
+        self._n = 0
+        self._lists = None      # cached per-bucket row arrays
+        self._lock = threading.RLock()
+
+    # ---------------- training ----------------
+    @property
+    def trained(self):
+        return self.coarse is not None
+
+    def train(self, x, iters=20, seed=0, max_samples=65536):
+        x = np.asarray(x, dtype=np.float32).reshape(-1, self.dim)
+        if len(x) > max_samples:
+            # k-means on a sample is plenty for the quantizers and keeps training fast
+            x = x[np.random.default_rng(seed).choice(len(x), max_samples, replace=False)]
+        self.coarse = kmeans(x, self.nlist, iters, seed)
+        self.nlist = len(self.coarse)
+        resid = x - self.coarse[_nearest(x, self.coarse)]
+        dsub = self.dim // self.m
+        ksub = min(self.ksub, len(x))
+        books = np.zeros((self.m, self.ksub, dsub), dtype=np.float32)
+        for j in range(self.m):
+            sub = resid[:, j * dsub:(j + 1) * dsub]
+            cb = kmeans(sub, ksub, iters, seed + j + 1)
+            books[j, :len(cb)] = cb
+            books[j, len(cb):] = cb[0]    # padding when ksub < 256; argmin never picks it
+        self.codebooks = books
+        self._precompute()
+        self._lists = None
+
+    def _precompute(self):
+        # |q - c - b|^2 = |q - c|^2 - 2<q, b> + (2<c, b> + |b|^2); the last term
+        # only depends on (bucket, codeword) so it is tabulated once here.
+        dsub = self.dim // self.m
+        c = self.coarse.reshape(len(self.coarse), self.m, dsub)
+        cb = np.einsum("cjd,jkd->cjk", c, self.codebooks)
+        self._bucket_tab = (2.0 * cb + np.einsum("jkd,jkd->jk", self.codebooks, self.codebooks)[None]).astype(np.float32)
+
+    def _encode(self, x, bucket):
+        resid = x - self.coarse[bucket]
+        dsub = self.dim // self.m
+        codes = np.empty((len(x), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = _nearest(resid[:, j * dsub:(j + 1) * dsub], self.codebooks[j])
+        return codes
+
+    # ---------------- mutation ----------------
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, name):
+        return name in self._rows
+
+    @property
+    def names(self):
+        with self._lock:
+            return list(self._rows)
+
+    def _reserve(self, need):
+        cap = len(self._vecs)
+        if need <= cap:
+            return
+        cap = max(need, cap * 2, 1024)
+        for attr, shape in (("_vecs", (cap, self.dim)), ("_codes", (cap, self.m)), ("_bucket", (cap,)), ("_alive", (cap,))):
+            old = getattr(self, attr)
+            new = np.zeros(shape, dtype=old.dtype)
+            new[:self._n] = old[:self._n]
+            setattr(self, attr, new)
+
+    def add_many(self, names, x):
+        if not self.trained:
+            raise RuntimeError("IVFPQIndex.train() must be called before adding")
+        x = np.asarray(x, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            for name in names:
+                self.remove(name)
+            bucket = _nearest(x, self.coarse).astype(np.int32)
+            codes = self._encode(x, bucket)
+            start = self._n
+            self._reserve(start + len(x))
+            end = start + len(x)
+            self._vecs[start:end] = x
+            self._codes[start:end] = codes
+            self._bucket[start:end] = bucket
+            self._alive[start:end] = True
+            for i, name in enumerate(names):
+                self._names.append(name)
+                self._rows[name] = start + i
+            self._n = end
+            self._lists = None
+
+    def add(self, name, enc):
+        self.add_many([name], enc)
+
+    def remove(self, name):
+        """Tombstone a row; it is skipped by search and dropped on save."""
+        with self._lock:
+            row = self._rows.pop(name, None)
+            if row is None:
+                return False
+            self._alive[row] = False
+            self._lists = None
+            return True
+
+    def apply(self, names, encs, removed=()):
+        """Upsert `names` and drop `removed` under one lock (same contract as GalleryIndex.apply)."""
+        with self._lock:
+            for name in removed:
+                self.remove(name)
+            if len(names):
+                self.add_many(names, encs)
+
+    def clear(self):
+        with self._lock:
+            self._alive[:self._n] = False
+            self._rows.clear()
+            self._lists = None
+
+    def _inverted_lists(self):
+        if self._lists is None:
+            rows = np.flatnonzero(self._alive[:self._n])
+            order = np.argsort(self._bucket[rows], kind="stable")
+            rows = rows[order]
+            bounds = np.searchsorted(self._bucket[rows], np.arange(self.nlist + 1))
+            self._lists = [rows[bounds[c]:bounds[c + 1]] for c in range(self.nlist)]
+        return self._lists
+
+    # ---------------- search ----------------
+    def search(self, encs, k=2, nprobe=None, rerank=None):
+        """
+        Approximate k-NN. Returns (rows, dists) of shape (len(encs), k);
+        missing neighbours are -1 / inf. Rows map to names via name_of().
+        """
+        nprobe = self.nprobe if nprobe is None else nprobe
+        rerank = self.rerank if rerank is None else rerank
+        q = np.asarray(encs, dtype=np.float32).reshape(-1, self.dim)
+        out_rows = np.full((len(q), k), -1, dtype=np.int64)
+        out_d = np.full((len(q), k), np.inf, dtype=np.float32)
+        with self._lock:
+            if not self.trained or not self._rows or len(q) == 0:
+                return out_rows, out_d
+            lists = self._inverted_lists()
+            dsub = self.dim // self.m
+            ar = np.arange(self.m)
+            coarse_d = (np.einsum("ij,ij->i", self.coarse, self.coarse)[None, :] - 2.0 * (q @ self.coarse.T)
+                        + np.einsum("ij,ij->i", q, q)[:, None])
+            nprobe = min(nprobe, self.nlist)
+            probe = np.argpartition(coarse_d, nprobe - 1, axis=1)[:, :nprobe]
+            qb = np.einsum("njd,jkd->njk", q.reshape(len(q), self.m, dsub), self.codebooks)
+            for qi in range(len(q)):
+                parts = [lists[c] for c in probe[qi]]
+                sizes = [len(p) for p in parts]
+                if not sum(sizes):
+                    continue
+                rows = np.concatenate(parts)
+                which = np.repeat(np.arange(len(parts)), sizes)
+                # one lookup table per probed bucket: (nprobe, m, ksub)
+                lut = self._bucket_tab[probe[qi]] - 2.0 * qb[qi][None]
+                d = lut[which[:, None], ar[None, :], self._codes[rows]].sum(axis=1)
+                d += coarse_d[qi, probe[qi]][which]
+                keep = max(k, rerank)
+                if len(rows) > keep:
+                    sel = np.argpartition(d, keep - 1)[:keep]
+                    rows, d = rows[sel], d[sel]
+                if rerank:
+                    diff = self._vecs[rows] - q[qi]
+                    d = np.einsum("ij,ij->i", diff, diff)
+                order = np.argsort(d)[:k]
+                out_rows[qi, :len(order)] = rows[order]
+                out_d[qi, :len(order)] = np.sqrt(np.maximum(d[order], 0.0))
+        return out_rows, out_d
+
+    def vectors(self, names):
+        """Exact stored embeddings of `names` (all present), e.g. to spot stale rows after a reload."""
+        with self._lock:
+            return self._vecs[[self._rows[n] for n in names]].copy()
+
+    def name_of(self, row):
+        return self._names[int(row)]
+
+    def match(self, encs, threshold, margin):
+        """Same DIST_THRESHOLD/MARGIN rule as GalleryIndex.match()."""
+        with self._lock:
+            rows, d = self.search(encs, k=2)
+            out = []
+            for r, (a, b) in zip(rows[:, 0], d):
+                if r < 0:
+                    out.append(("Unknown", 1.0))
+                    continue
+                gap = float(b - a) if np.isfinite(b) else 1.0
+                name = self.name_of(r) if (a < threshold and gap >= margin) else "Unknown"
+                out.append((name, float(a)))
+        return out
+
+    # ---------------- persistence ----------------
+    def save(self, path):
+        with self._lock:
+            rows = np.array(sorted(self._rows.values()), dtype=np.int64)
+            names = np.array([self._names[r] for r in rows], dtype=str)
+            with open(path, "wb") as f:
+                np.savez(
+                    f,
+                    params=np.array([self.dim, self.nlist, self.m, self.ksub, self.nprobe, self.rerank]),
+                    coarse=self.coarse, codebooks=self.codebooks,
+                    vecs=self._vecs[rows], codes=self._codes[rows], bucket=self._bucket[rows], names=names,
+                )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as z:
+            dim, nlist, m, ksub, nprobe, rerank = (int(v) for v in z["params"])
+            idx = cls(dim=dim, nlist=nlist, m=m, nbits=int(ksub).bit_length() - 1, nprobe=nprobe, rerank=rerank)
+            idx.coarse = z["coarse"]
+            idx.codebooks = z["codebooks"]
+            idx._precompute()
+            n = len(z["names"])
+            idx._reserve(n)
+            idx._vecs[:n] = z["vecs"]
+            idx._codes[:n] = z["codes"]
+            idx._bucket[:n] = z["bucket"]
+            idx._alive[:n] = True
+            idx._names = [str(s) for s in z["names"]]
+            idx._rows = {name: i for i, name in enumerate(idx._names)}
+            idx._n = n
+        return idx
+
+    @classmethod
+    def build(cls, names, x, **params):
+        idx = cls(**params)
+        x = np.asarray(x, dtype=np.float32).reshape(-1, idx.dim)
+        idx.train(x)
+        idx.add_many(list(names), x)
+        return idx
@@ -0,0 +1,161 @@
+import atexit
+import csv
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+
+# ---------------- Backends ----------------
+class CSVBackend:
+    """Appends rows to attendance_log.csv (Name, Mobile, Time); one open() per batch."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def open(self):
+        if not os.path.exists(self.path):
+            with open(self.path, 'w', newline='') as f:
+                csv.writer(f).writerow(['Name', 'Mobile', 'Time'])
+
+    def write(self, rows):
+        with open(self.path, "a", newline='') as f:
+            csv.writer(f).writerows(rows)
+
+    def close(self):
+        pass
+
+
+class SQLiteBackend:
+    """
+    attendance(name, mobile, time) table in a SQLite file in WAL mode, so
+    readers (reports, exports) never block the writer. One transaction per batch.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = None
+
+    def open(self):
+        # called on the writer thread: sqlite connections stay on their thread
+        self._db = sqlite3.connect(self.path, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS attendance (name TEXT, mobile TEXT, time TEXT)")
+        self._db.commit()
+
+    def write(self, rows):
+        with self._db:
+            self._db.executemany("INSERT INTO attendance (name, mobile, time) VALUES (?, ?, ?)", rows)
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def make_backend(path):
+    """SQLite for .db/.sqlite/.sqlite3 paths, CSV otherwise."""
+    if os.path.splitext(path)[1].lower() in (".db", ".sqlite", ".sqlite3"):
+        return SQLiteBackend(path)
+    return CSVBackend(path)
+
+
+# ---------------- Sink ----------------
+class AttendanceSink:
+    """
+    Attendance writer with a per-person cooldown.
+    Thread-safe, so several cameras / workers can mark people through one sink.
+
+    mark() only checks and updates the in-memory cooldown (`marked`), plus
+    the cross-process CooldownStore when one is given, and queues the row;
+    a background thread writes queued rows in batches of up to `batch_size`,
+    at the latest `flush_secs` after the first one arrived, and on close() /
+    interpreter exit. A failed write is kept and retried
+    with the next batch, so a flaky network drive delays rows but drops none.
+    """
+
+    def __init__(self, path="attendance_log.csv", cooldown_secs=120, backend=None,
+                 flush_secs=1.0, batch_size=64, cooldown_store=None):
+        self.path = path
+        self.cooldown_secs = cooldown_secs
+        self.cooldown_store = cooldown_store
+        self.backend = backend or make_backend(path)
+        self.flush_secs = flush_secs
+        self.batch_size = batch_size
+        self.marked = {}   # name -> datetime of last mark (rows may still be queued)
+        self.written = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._writer, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def mark(self, name, mobile, now=None):
+        """Queue a row unless `name` was marked within the cooldown. Returns the time marked or None."""
+        now = now or datetime.now()
+        with self._lock:
+            last = self.marked.get(name)
+            if last and (now - last).total_seconds() < self.cooldown_secs:
+                return None
+            if self.cooldown_store is not None and not self.cooldown_store.try_mark(name, now.timestamp()):
+                return None   # marked by another process (or before a restart)
+            self.marked[name] = now
+        self._queue.put([name, mobile, now.strftime("%Y-%m-%d %H:%M:%S")])
+        return now
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _writer(self):
+        try:
+            self.backend.open()
+        except Exception as e:
+            print(f"[attendance] cannot open {self.path}: {e}")
+        rows = []
+        first_at = None
+        stop = False
+        while not stop:
+            timeout = None if not rows else max(0.0, first_at + self.flush_secs - time.time())
+            try:
+                row = self._queue.get(timeout=timeout)
+                if row is None:
+                    stop = True
+                else:
+                    if not rows:
+                        first_at = time.time()
+                    rows.append(row)
+                    if len(rows) < self.batch_size and time.time() - first_at < self.flush_secs:
+                        continue
+            except queue.Empty:
+                pass
+            if rows and self._flush(rows):
+                rows = []
+            elif rows:
+                first_at = time.time()   # back off one flush period before retrying
+        if rows:
+            self._flush(rows)
+        self.backend.close()
+
+    def _flush(self, rows):
+        try:
+            self.backend.write(rows)
+        except Exception as e:
+            self.errors += 1
+            print(f"[attendance] write to {self.path} failed ({len(rows)} rows kept): {e}")
+            return False
+        self.written += len(rows)
+        return True
+
+    def close(self, timeout=5.0):
+        """Flush everything queued and stop the writer thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
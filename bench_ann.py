@@ -0,0 +1,84 @@
+"""
+Recall / latency benchmark: IVF-PQ approximate index vs exact GalleryIndex.
+
+Uses the cached 'enc' vectors from face_data.json and pads the gallery with
+synthetic identities (jittered copies / random vectors at face-embedding
+scale) up to --size so large-site behaviour can be measured on a laptop.
+
+    python bench_ann.py --size 100000 --queries 500 --nprobe 1 4 8 16 32
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from ann_index import IVFPQIndex
+from gallery_index import GalleryIndex
+
+
+def load_cached_encodings(path):
+    if not os.path.exists(path):
+        return np.zeros((0, 128), dtype=np.float32)
+    with open(path, "r") as f:
+        data = json.load(f)
+    encs = [info["enc"] for info in data.values() if isinstance(info, dict) and len(info.get("enc") or []) == 128]
+    return np.array(encs, dtype=np.float32).reshape(-1, 128)
+
+
+def synth_gallery(real, size, rng):
+    if len(real) >= size:
+        return real[:size]
+    if len(real):
+        base = real[rng.integers(0, len(real), size - len(real))]
+        extra = base + rng.normal(0, 0.06, base.shape).astype(np.float32)
+    else:
+        extra = rng.normal(0, 0.09, (size, 128)).astype(np.float32)
+    return np.vstack([real, extra]).astype(np.float32)
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--data", default="face_data.json")
+    ap.add_argument("--size", type=int, default=100000)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--nlist", type=int, default=1024)
+    ap.add_argument("--m", type=int, default=16)
+    ap.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    ap.add_argument("--rerank", type=int, default=32)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    x = synth_gallery(load_cached_encodings(args.data), args.size, rng)
+    names = [f"id{i}" for i in range(len(x))]
+    qi = rng.integers(0, len(x), args.queries)
+    q = x[qi] + rng.normal(0, 0.02, (args.queries, x.shape[1])).astype(np.float32)
+    print(f"gallery={len(x)} queries={len(q)}")
+
+    exact = GalleryIndex(capacity=len(x))
+    for n, v in zip(names, x):
+        exact.add(n, v)
+    (truth, _, _), t_exact = timed(exact.top2, q)
+    print(f"exact batch: {1000 * t_exact / len(q):8.3f} ms/query  recall@1=1.000")
+    # per-tick shape: a handful of faces per call, as in recognize_and_draw
+    _, t_exact = timed(lambda: [exact.top2(q[i:i + 1]) for i in range(len(q))])
+    print(f"exact      : {1000 * t_exact / len(q):8.3f} ms/query  (one face per call)")
+
+    idx, t_build = timed(IVFPQIndex.build, names, x, nlist=args.nlist, m=args.m, rerank=args.rerank)
+    print(f"ivfpq build: {t_build:.1f} s (nlist={idx.nlist}, m={args.m})")
+    for nprobe in args.nprobe:
+        rows, t = timed(lambda: np.concatenate([idx.search(q[i:i + 1], 2, nprobe)[0] for i in range(len(q))]))
+        recall = float(np.mean(rows[:, 0] == truth))
+        print(f"nprobe={nprobe:<4}: {1000 * t / len(q):8.3f} ms/query  recall@1={recall:.3f}  speedup={t_exact / t:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Face-encoding throughput vs. number of faces per frame: serial
+face_recognition.face_encodings against EncodePool (shared-memory workers).
+
+    python bench_encode_pool.py --image group.jpg --faces 1 2 4 8 12 15
+
+Without --image a synthetic 1280x720 frame is used; the landmark + ResNet
+cost per box does not depend on the content, so timings are representative.
+"""
+import warnings
+warnings.filterwarnings(
+    "ignore",
+    message=".pkg_resources is deprecated as an API.",
+    category=UserWarning,
+    module="face_recognition_models"
+)
+
+import argparse
+import time
+
+import face_recognition
+import numpy as np
+
+from encode_pool import EncodePool
+
+
+def grid_boxes(shape, count, size=160):
+    h, w = shape[:2]
+    cols = max(1, w // size)
+    boxes = []
+    for i in range(count):
+        r, c = divmod(i, cols)
+        t, l = (r * size) % max(1, h - size), c * size
+        boxes.append((t, l + size, t + size, l))
+    return boxes
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--image")
+    ap.add_argument("--faces", type=int, nargs="+", default=[1, 2, 4, 8, 12, 15])
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    if args.image:
+        frame = face_recognition.load_image_file(args.image)
+    else:
+        frame = np.random.default_rng(0).integers(0, 255, (720, 1280, 3), dtype=np.uint8)
+    boxes_all = face_recognition.face_locations(frame) if args.image else []
+
+    with EncodePool(workers=args.workers, min_parallel=1) as pool:
+        pool.encode(frame, grid_boxes(frame.shape, pool.workers))   # warm up workers
+        print(f"workers={pool.workers} frame={frame.shape[1]}x{frame.shape[0]}")
+        print(f"{'faces':>5} {'serial ms':>10} {'pool ms':>9} {'serial f/s':>11} {'pool f/s':>9} {'speedup':>8}")
+        for n in args.faces:
+            boxes = (boxes_all * n)[:n] if boxes_all else grid_boxes(frame.shape, n)
+            t_ser = best_of(lambda: face_recognition.face_encodings(frame, boxes), args.repeat)
+            t_pool = best_of(lambda: pool.encode(frame, boxes), args.repeat)
+            print(f"{n:>5} {1000 * t_ser:>10.1f} {1000 * t_pool:>9.1f} {n / t_ser:>11.1f} {n / t_pool:>9.1f} {t_ser / t_pool:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
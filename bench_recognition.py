@@ -0,0 +1,308 @@
+"""
+Offline speed and accuracy benchmark for the recognition pipeline.
+
+Replays labelled frames or a video through the same stages the apps run
+(detect -> quality -> encode -> match against the enrolled gallery) and
+reports per-stage latency percentiles, FPS, and true/false accept rates
+for a sweep of distance thresholds.
+
+    python bench_recognition.py --frames eval/ --store face_data
+    python bench_recognition.py --video door.mp4 --label Asha --scale 0.4 --json run.json
+
+Labelled frames: eval/<person>/*.jpg, or files named like enrollment shots
+("Asha_1723456789.jpg") directly in the directory. People who are not in
+the gallery (or a folder named "unknown") count as impostors. The largest
+face in each frame is the probe for that frame's label.
+
+    python bench_recognition.py --frames eval/ --compare hog haar dnn --limit 300
+
+--compare replays the same frames through each detector backend (see
+face_detectors) and reports detection speed against recall: the share of
+labelled frames with a usable face, the share of the first detector's boxes
+also found, and the recognition TAR/FAR at --threshold.
+"""
+import warnings
+warnings.filterwarnings(
+    "ignore",
+    message=".pkg_resources is deprecated as an API.",
+    category=UserWarning,
+    module="face_recognition_models"
+)
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import time
+
+import cv2
+import face_recognition
+import numpy as np
+
+from embedding_store import EmbeddingStore
+from face_core import map_boxes
+from face_detectors import DETECTOR_KINDS, make_detector
+from face_quality import face_quality_ok
+from gallery_index import GalleryIndex
+from image_files import IMAGE_EXTS, person_name
+
+STAGES = ("decode", "detect", "quality", "encode", "match")
+UNKNOWN_LABELS = ("unknown", "_unknown", "impostor")
+
+
+def labelled_frames(root):
+    """Yield (label, path) for eval/<person>/*.jpg or eval/<Name>_<stamp>.jpg."""
+    for entry in sorted(os.listdir(root)):
+        path = os.path.join(root, entry)
+        if os.path.isdir(path):
+            for f in sorted(os.listdir(path)):
+                if f.lower().endswith(IMAGE_EXTS):
+                    yield entry, os.path.join(path, f)
+        elif entry.lower().endswith(IMAGE_EXTS):
+            yield person_name(entry), path
+
+
+def video_frames(path, label, step):
+    cap = cv2.VideoCapture(path)
+    i = 0
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if i % step == 0:
+            yield label, frame
+        i += 1
+    cap.release()
+
+
+def load_gallery(base):
+    store = EmbeddingStore(base)
+    gallery = GalleryIndex(capacity=max(1024, len(store.records)))
+    names = list(store.records)
+    if names:
+        gallery.add_many(names, store.vectors()[[store.records[n]['row'] for n in names]])
+    return gallery
+
+
+def percentiles(ms):
+    if not ms:
+        return {"n": 0}
+    a = np.asarray(ms)
+    return {"n": len(a), "mean": float(a.mean()), "p50": float(np.percentile(a, 50)),
+            "p90": float(np.percentile(a, 90)), "p95": float(np.percentile(a, 95)),
+            "p99": float(np.percentile(a, 99)), "max": float(a.max())}
+
+
+def run(source, gallery, args, detector):
+    lat = {s: [] for s in STAGES}
+    frame_ms = []
+    detections = []   # boxes per frame, for comparing detectors
+    probes = []   # (label, genuine, best_name, d1, d2)
+    frames = faces = low_quality = no_face = 0
+    names = gallery.names
+    for label, item in source:
+        t0 = time.perf_counter()
+        frame = cv2.imread(item) if isinstance(item, str) else item
+        t1 = time.perf_counter()
+        if frame is None:
+            continue
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        small = cv2.resize(rgb, (0, 0), fx=args.scale, fy=args.scale) if args.scale != 1.0 else rgb
+        boxes = map_boxes(args.scale, detector.detect(small))
+        t2 = time.perf_counter()
+        good = [b for b in boxes if face_quality_ok(rgb, b, args.min_size, args.min_blur)]
+        t3 = time.perf_counter()
+        encs = face_recognition.face_encodings(rgb, good) if good else []
+        t4 = time.perf_counter()
+        best, d1, d2 = gallery.top2(encs) if len(encs) and len(gallery) else ([], [], [])
+        t5 = time.perf_counter()
+
+        frames += 1
+        faces += len(boxes)
+        low_quality += len(boxes) - len(good)
+        for s, a, b in zip(STAGES, (t0, t1, t2, t3, t4), (t1, t2, t3, t4, t5)):
+            lat[s].append((b - a) * 1000.0)
+        frame_ms.append((t5 - t0) * 1000.0)
+        detections.append(boxes)
+
+        if label is None:
+            continue
+        if not good:
+            no_face += 1
+            continue
+        # largest good face is the probe for this frame's label
+        i = max(range(len(good)), key=lambda j: (good[j][2] - good[j][0]) * (good[j][1] - good[j][3]))
+        genuine = label in gallery and label.lower() not in UNKNOWN_LABELS
+        if len(best):
+            probes.append((label, genuine, names[best[i]], float(d1[i]), float(d2[i])))
+        else:
+            probes.append((label, genuine, None, float("inf"), float("inf")))
+    return lat, frame_ms, probes, detections, {"frames": frames, "faces": faces, "low_quality": low_quality,
+                                               "labelled_without_face": no_face}
+
+
+def accept_rates(probes, thresholds, margin):
+    genuine = [p for p in probes if p[1]]
+    impostor = [p for p in probes if not p[1]]
+    rows = []
+    for t in thresholds:
+        accepted = lambda p: p[3] <= t and (p[4] - p[3]) >= margin
+        ta = sum(1 for p in genuine if accepted(p) and p[2] == p[0])
+        misid = sum(1 for p in genuine if accepted(p) and p[2] != p[0])
+        fa = sum(1 for p in impostor if accepted(p))
+        rows.append({"threshold": t,
+                     "tar": ta / len(genuine) if genuine else None,
+                     "misid_rate": misid / len(genuine) if genuine else None,
+                     "far": fa / len(impostor) if impostor else None})
+    return {"genuine": len(genuine), "impostor": len(impostor), "by_threshold": rows}
+
+
+def fmt_rate(x):
+    return "   -  " if x is None else f"{x * 100:5.1f}%"
+
+
+def box_recall(reference, found):
+    """Share of reference boxes with a found box centred inside them (backends frame faces differently)."""
+    total = hit = 0
+    for ref_boxes, boxes in zip(reference, found):
+        centres = [((t + b) / 2, (l + r) / 2) for (t, r, b, l) in boxes]
+        for (t, r, b, l) in ref_boxes:
+            total += 1
+            hit += any(t <= y <= b and l <= x <= r for y, x in centres)
+    return hit / total if total else None
+
+
+def compare_detectors(frames, gallery, args):
+    """Same frames through every --compare backend; one row of speed and recall each."""
+    rows = []
+    reference = None
+    for spec in args.compare:
+        try:
+            detector = make_detector(spec, upsample=args.upsample)
+        except ValueError as e:
+            print(f"[skip] {spec}: {e}")
+            continue
+        t0 = time.perf_counter()
+        lat, frame_ms, probes, detections, counts = run(frames, gallery, args, detector)
+        wall = time.perf_counter() - t0
+        if reference is None:
+            reference = detections
+        labelled = len(probes) + counts["labelled_without_face"]
+        rates = accept_rates(probes, [args.threshold], args.margin)["by_threshold"][0]
+        rows.append({"detector": spec,
+                     "detect_ms": percentiles(lat["detect"]),
+                     "fps": counts["frames"] / wall if wall > 0 else 0.0,
+                     "faces": counts["faces"],
+                     "frame_recall": len(probes) / labelled if labelled else None,
+                     "box_recall": box_recall(reference, detections),
+                     "tar": rates["tar"], "far": rates["far"]})
+    if not rows:
+        return rows
+    print(f"\n{len(frames)} frames; box recall vs {rows[0]['detector']}, TAR/FAR at {args.threshold}")
+    print(f"{'detector':>12} {'p50 ms':>8} {'p95 ms':>8} {'FPS':>6} {'faces':>6} "
+          f"{'frames':>7} {'boxes':>7} {'TAR':>7} {'FAR':>7}")
+    for r in rows:
+        d = r["detect_ms"]
+        print(f"{r['detector'][:12]:>12} {d.get('p50', 0):8.2f} {d.get('p95', 0):8.2f} {r['fps']:6.1f} "
+              f"{r['faces']:6d} {fmt_rate(r['frame_recall']):>7} {fmt_rate(r['box_recall']):>7} "
+              f"{fmt_rate(r['tar']):>7} {fmt_rate(r['far']):>7}")
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--frames", help="directory of labelled frames")
+    src.add_argument("--video", help="video file to replay")
+    ap.add_argument("--label", help="person in --video (omit for speed only)")
+    ap.add_argument("--every", type=int, default=1, help="use every Nth video frame")
+    ap.add_argument("--store", default="face_data", help="embedding store base path")
+    ap.add_argument("--scale", type=float, default=0.5, help="detection downscale (DOWNSCALE)")
+    ap.add_argument("--upsample", type=int, default=0, help="HOG upsampling (UPSCALE)")
+    ap.add_argument("--detector", default="hog", help=f"detector backend ({', '.join(DETECTOR_KINDS)}[:model files])")
+    ap.add_argument("--compare", nargs="+", metavar="DETECTOR",
+                    help="compare these detectors on the same frames (first one is the recall reference)")
+    ap.add_argument("--threshold", type=float, default=0.45, help="DIST_THRESHOLD for --compare TAR/FAR")
+    ap.add_argument("--limit", type=int, default=None, help="use at most this many frames")
+    ap.add_argument("--min-size", type=int, default=80)
+    ap.add_argument("--min-blur", type=float, default=120.0)
+    ap.add_argument("--margin", type=float, default=0.03, help="best/second-best gap (MARGIN)")
+    ap.add_argument("--thresholds", type=float, nargs="+",
+                    default=[0.35, 0.4, 0.45, 0.5, 0.55, 0.6], help="DIST_THRESHOLD values to sweep")
+    ap.add_argument("--json", help="write machine-readable results here")
+    ap.add_argument("--tag", default="", help="free-form run label stored in the JSON")
+    ap.add_argument("--baseline", help="earlier --json result to print deltas against")
+    args = ap.parse_args()
+
+    gallery = load_gallery(args.store)
+    if args.frames:
+        source = labelled_frames(args.frames)
+    else:
+        source = video_frames(args.video, args.label, max(1, args.every))
+    if args.limit:
+        source = itertools.islice(source, args.limit)
+    print(f"Gallery: {len(gallery)} people; scale {args.scale} upsample {args.upsample}")
+
+    if args.compare:
+        rows = compare_detectors(list(source), gallery, args)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"tag": args.tag, "when": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                           "source": args.frames or args.video,
+                           "params": {"scale": args.scale, "upsample": args.upsample, "threshold": args.threshold,
+                                      "margin": args.margin, "gallery": len(gallery)},
+                           "detectors": rows}, f, indent=2)
+            print(f"\nResults written to {args.json}")
+        return
+
+    t0 = time.perf_counter()
+    lat, frame_ms, probes, _, counts = run(source, gallery, args, make_detector(args.detector, args.upsample))
+    wall = time.perf_counter() - t0
+    stages = {s: percentiles(v) for s, v in lat.items()}
+    stages["frame"] = percentiles(frame_ms)
+    accuracy = accept_rates(probes, args.thresholds, args.margin)
+    fps = counts["frames"] / wall if wall > 0 else 0.0
+
+    print(f"\n{counts['frames']} frames, {counts['faces']} faces ({counts['low_quality']} low quality), "
+          f"{fps:.1f} FPS")
+    print(f"{'stage':>8} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8}  ms")
+    for s, p in stages.items():
+        if p["n"]:
+            print(f"{s:>8} {p['mean']:8.2f} {p['p50']:8.2f} {p['p95']:8.2f} {p['p99']:8.2f}")
+    if probes:
+        print(f"\n{accuracy['genuine']} genuine / {accuracy['impostor']} impostor probes, margin {args.margin}")
+        print(f"{'thresh':>7} {'TAR':>7} {'misid':>7} {'FAR':>7}")
+        for r in accuracy["by_threshold"]:
+            print(f"{r['threshold']:7.2f} {fmt_rate(r['tar']):>7} {fmt_rate(r['misid_rate']):>7} {fmt_rate(r['far']):>7}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            base = json.load(f)
+        print(f"\nvs {args.baseline} ({base.get('tag') or base.get('when')}): "
+              f"FPS {base['fps']:.1f} -> {fps:.1f}")
+        for s, p in stages.items():
+            b = base["latency_ms"].get(s, {})
+            if p["n"] and b.get("n"):
+                print(f"{s:>8} p50 {b['p50']:7.2f} -> {p['p50']:7.2f}   p95 {b['p95']:7.2f} -> {p['p95']:7.2f} ms")
+
+    if args.json:
+        result = {
+            "tag": args.tag,
+            "when": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "machine": {"platform": platform.platform(), "cpu": platform.processor(), "cpus": os.cpu_count()},
+            "source": args.frames or args.video,
+            "params": {"detector": args.detector, "scale": args.scale, "upsample": args.upsample, "min_size": args.min_size,
+                       "min_blur": args.min_blur, "margin": args.margin, "gallery": len(gallery)},
+            "counts": counts,
+            "fps": fps,
+            "latency_ms": stages,
+            "accuracy": accuracy,
+        }
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Per-frame allocations and time of the 4.py render loop: the old path
+(read().copy() -> draw -> cvtColor -> Image.fromarray -> new PhotoImage)
+against the pooled path (read_into(FramePool) -> draw -> cvtColor into a
+reused buffer -> Image.frombuffer -> PhotoImage.paste).
+
+    python bench_render.py --frames 300 --width 1280 --height 720 [--tk]
+
+Allocations are measured with tracemalloc (numpy/OpenCV arrays are traced).
+--tk also creates the PhotoImage step; it needs a display.
+"""
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from camera_reader import CameraReader
+from frame_pool import FramePool, FrameRenderer
+
+
+def draw_boxes(frame_bgr):
+    # stand-in for draw_overlay: two labelled boxes
+    for l in (200, 700):
+        cv2.rectangle(frame_bgr, (l, 200), (l + 220, 460), (0, 210, 210), 2)
+        cv2.putText(frame_bgr, "Someone", (l + 6, 194), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (10, 10, 10), 1)
+    return frame_bgr
+
+
+def old_loop(camera, label):
+    frame = camera.read()
+    vis = draw_boxes(frame)
+    img_rgb = cv2.cvtColor(vis, cv2.COLOR_BGR2RGB)
+    img_pil = Image.fromarray(img_rgb)
+    if label is not None:
+        from PIL import ImageTk
+        imgtk = ImageTk.PhotoImage(image=img_pil)
+        label.imgtk = imgtk
+        label.configure(image=imgtk)
+
+
+def make_new_loop(label):
+    pool = FramePool()
+    renderer = FrameRenderer(label) if label is not None else None
+    rgb_pool = FramePool(count=1)
+
+    def new_loop(camera, _label):
+        frame = camera.read_into(pool)
+        vis = draw_boxes(frame)
+        if renderer:
+            renderer.show(vis)
+        else:
+            h, w = vis.shape[:2]
+            rgb = rgb_pool.get((h, w, 3))
+            cv2.cvtColor(vis, cv2.COLOR_BGR2RGB, dst=rgb)
+            Image.frombuffer("RGB", (w, h), rgb, "raw", "RGB", 0, 1)
+    return new_loop
+
+
+def measure(step, camera, label, frames):
+    for _ in range(5):
+        step(camera, label)   # warm up (first-frame buffer allocation)
+    tracemalloc.start()
+    peak_new = 0
+    for _ in range(frames):
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        step(camera, label)
+        peak_new = max(peak_new, tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    # timed separately, without tracemalloc overhead
+    t0 = time.perf_counter()
+    for _ in range(frames):
+        step(camera, label)
+    plain = time.perf_counter() - t0
+    return peak_new, plain / frames * 1000.0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--frames", type=int, default=300)
+    ap.add_argument("--width", type=int, default=1280)
+    ap.add_argument("--height", type=int, default=720)
+    ap.add_argument("--tk", action="store_true")
+    args = ap.parse_args()
+
+    camera = CameraReader()
+    camera.latest_frame = np.random.default_rng(0).integers(0, 255, (args.height, args.width, 3), dtype=np.uint8)
+
+    label = None
+    if args.tk:
+        from tkinter import Tk, Label
+        root = Tk()
+        label = Label(root)
+        label.pack()
+
+    frame_mb = camera.latest_frame.nbytes / 1e6
+    print(f"{args.width}x{args.height} frame = {frame_mb:.2f} MB, {args.frames} frames")
+    print(f"{'path':>8} {'peak new MB/frame':>18} {'x frame':>7} {'ms/frame':>9}")
+    for name, step in (("old", old_loop), ("pooled", make_new_loop(label))):
+        peak, ms = measure(step, camera, label, args.frames)
+        print(f"{name:>8} {peak / 1e6:18.2f} {peak / 1e6 / frame_mb:7.1f} {ms:9.2f}")
+
+
+if __name__ == "__main__":
+    main()
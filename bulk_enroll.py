@@ -0,0 +1,169 @@
+"""
+Bulk enrollment: encode every image in known_faces/ across all CPU cores and
+append the embeddings to the binary store used by 4.py.
+
+    python bulk_enroll.py                       # known_faces/ -> face_data.f32
+    python bulk_enroll.py --dir new_batch --workers 6 --mobiles people.csv
+
+Images are keyed on the SHA-1 of their bytes: every image already encoded
+is listed in <store>.done (and images without a face in <store>.nofaces),
+so it is never encoded again. Results are appended as they finish, so an
+interrupted run simply resumes where it stopped.
+Person name = file name without extension and trailing "_<digits>" stamp,
+matching how the apps save enrollment shots (e.g. "Asha_1723456789.jpg").
+People already in the store (enrolled by the apps or an earlier run) are
+left alone, as is any image that is already a record's source; the first
+usable photo of a new person enrolls them. --update lets new photos of
+existing people replace their embedding, keeping their mobile unless
+--mobiles gives a new one.
+"""
+import warnings
+warnings.filterwarnings(
+    "ignore",
+    message=".pkg_resources is deprecated as an API.",
+    category=UserWarning,
+    module="face_recognition_models"
+)
+
+import argparse
+import csv
+import os
+import sys
+import time
+from multiprocessing import Pool, cpu_count
+
+import face_recognition
+import numpy as np
+
+from embedding_store import EmbeddingStore
+from file_hash import file_sha1
+from image_files import IMAGE_EXTS, person_name
+
+KNOWN_FACE_DIR = "known_faces"
+STORE_BASE = "face_data"
+FLUSH_EVERY = 32
+
+
+def encode_image(job):
+    """Worker: (path, sha1) -> (path, sha1, enc or None, error or None)."""
+    path, sha1 = job
+    try:
+        img = face_recognition.load_image_file(path)
+        locs = face_recognition.face_locations(img, number_of_times_to_upsample=0, model="hog")
+        if not locs:
+            return path, sha1, None, "no face"
+        # biggest face when a photo has several
+        locs = [max(locs, key=lambda b: (b[2] - b[0]) * (b[1] - b[3]))]
+        encs = face_recognition.face_encodings(img, locs)
+        if not encs:
+            return path, sha1, None, "no encoding"
+        return path, sha1, np.asarray(encs[0], dtype=np.float32), None
+    except Exception as e:
+        return path, sha1, None, str(e)
+
+
+def load_mobiles(path):
+    if not path:
+        return {}
+    with open(path, newline="") as f:
+        return {row[0].strip(): row[1].strip() for row in csv.reader(f) if len(row) >= 2}
+
+
+def load_hashes(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def progress(done, total, ok, failed, t0):
+    rate = done / max(time.time() - t0, 1e-6)
+    eta = (total - done) / rate if rate > 0 else 0
+    sys.stdout.write(f"\r[{done}/{total}] enrolled={ok} failed={failed} {rate:.1f} img/s eta {eta:.0f}s ")
+    sys.stdout.flush()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--dir", default=KNOWN_FACE_DIR)
+    ap.add_argument("--store", default=STORE_BASE, help="store base path (default: face_data)")
+    ap.add_argument("--workers", type=int, default=cpu_count())
+    ap.add_argument("--mobiles", help="CSV of name,mobile")
+    ap.add_argument("--retry-failed", action="store_true", help="re-try images that had no face last time")
+    ap.add_argument("--update", action="store_true",
+                    help="let new photos of people already in the store replace their embedding")
+    args = ap.parse_args()
+
+    store = EmbeddingStore(args.store)
+    failed_path = args.store + ".nofaces"
+    done_path = args.store + ".done"
+    mobiles = load_mobiles(args.mobiles)
+    skip = load_hashes(done_path) | store.hashes()
+    if not args.retry_failed:
+        skip |= load_hashes(failed_path)
+    sources = {rec["image"] for rec in store.records.values() if rec.get("image")}
+
+    files = sorted(
+        os.path.join(args.dir, f) for f in os.listdir(args.dir)
+        if f.lower().endswith(IMAGE_EXTS)
+    )
+    jobs = []
+    for path in files:
+        if os.path.basename(path) in sources:
+            continue   # already the source of a record (e.g. enrolled by 4.py)
+        if person_name(path) in store.records and not args.update:
+            continue   # never replace an existing identity unless asked to
+        sha1 = file_sha1(path)
+        if sha1 not in skip:
+            jobs.append((path, sha1))
+            skip.add(sha1)  # identical copies are encoded once
+    print(f"{len(files)} images, {len(files) - len(jobs)} already enrolled or cached, "
+          f"{len(jobs)} to encode on {args.workers} workers")
+    if not jobs:
+        return
+
+    pending, finished, ok, failed, t0 = [], [], 0, 0, time.time()
+    enrolled = set()   # names enrolled by this run
+
+    def flush():
+        # hashes go to the ledger only once their rows are in the store
+        store.append_many(pending)
+        with open(done_path, "a") as f:
+            f.writelines(sha1 + "\n" for sha1 in finished)
+        pending.clear()
+        finished.clear()
+
+    pool = Pool(args.workers)
+    try:
+        with open(failed_path, "a") as bad:
+            for done, (path, sha1, enc, err) in enumerate(pool.imap_unordered(encode_image, jobs, chunksize=4), 1):
+                if enc is None:
+                    failed += 1
+                    bad.write(sha1 + "\n")
+                    bad.flush()
+                else:
+                    name = person_name(path)
+                    finished.append(sha1)
+                    if name in enrolled and not args.update:
+                        pass   # another photo of someone this run already enrolled
+                    else:
+                        old = store.records.get(name, {})
+                        mobile = mobiles.get(name) or old.get("mobile", "")
+                        pending.append((name, mobile, os.path.basename(path), enc, sha1))
+                        enrolled.add(name)
+                        ok += 1
+                    if len(finished) >= FLUSH_EVERY:
+                        flush()
+                progress(done, len(jobs), ok, failed, t0)
+        pool.close()
+    except KeyboardInterrupt:
+        pool.terminate()
+        print("\nInterrupted; progress saved, re-run to resume.")
+    finally:
+        flush()
+        pool.join()
+    print(f"\nDone: {ok} enrolled, {failed} without a usable face ({time.time() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
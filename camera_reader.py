@@ -0,0 +1,330 @@
+import base64
+import http.client
+import threading
+import time
+import urllib.parse
+
+import cv2
+import numpy as np
+
+from fast_decode import JpegFrame
+from mjpeg_stream import MJPEGStreamParser, read_mjpeg
+
+
+class CameraReader:
+    """
+    USB/laptop webcam captured on a background thread into a fixed ring of
+    `ring_size` preallocated frame buffers.
+
+    Every captured frame gets a sequence number (frame_count, starting at 1)
+    and a capture timestamp. read_next(after_seq) blocks on a condition
+    variable until a frame newer than `after_seq` exists, so consumers never
+    re-process a duplicate and never have to poll with sleep().
+    on_frame, if set, is called from the capture thread with a private copy.
+    """
+
+    def __init__(self, index=0, width=1280, height=720, ring_size=4):
+        self.index = index
+        self.width = width
+        self.height = height
+        self.ring_size = max(2, ring_size)   # the slot being captured into is never the newest
+        self.cap = None
+        self.running = False
+        self.frame_lock = threading.Lock()
+        self.frame_cond = threading.Condition(self.frame_lock)
+        self.latest_frame = None
+        self.thread = None
+        self.on_frame = None    # optional callback(frame) from the capture thread
+        self.frame_count = 0    # sequence number of the newest frame (0 = none yet)
+        self.profiler = None    # optional profiling.Profiler: records "capture"
+        self._ring = [None] * self.ring_size
+        self._seqs = np.zeros(self.ring_size, dtype=np.int64)    # 0 = slot empty / being written
+        self._stamps = np.zeros(self.ring_size, dtype=np.float64)
+
+    def start(self):
+        self.stop()
+        backend = cv2.CAP_DSHOW if hasattr(cv2, 'CAP_DSHOW') else 0
+        self.cap = cv2.VideoCapture(self.index, backend)
+        # Best-effort tuning
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def _loop(self):
+        consecutive_fail = 0
+        while self.running:
+            if not self.cap:
+                time.sleep(0.02)
+                continue
+            i = self.frame_count % self.ring_size
+            with self.frame_lock:
+                self._seqs[i] = 0   # oldest slot is about to be overwritten
+            slot = self._ring[i]
+            t0 = time.perf_counter()
+            ok, frame = self.cap.read(slot) if slot is not None else self.cap.read()
+            if self.profiler and ok:
+                self.profiler.record("capture", (time.perf_counter() - t0) * 1000.0)
+            if not ok:
+                consecutive_fail += 1
+                if consecutive_fail > 30:
+                    self._reopen()
+                    consecutive_fail = 0
+                time.sleep(0.01)
+                continue
+            consecutive_fail = 0
+            with self.frame_cond:
+                self._ring[i] = frame   # same array as slot unless the size changed
+                self.frame_count += 1
+                self._seqs[i] = self.frame_count
+                self._stamps[i] = time.time()
+                self.latest_frame = frame
+                self.frame_cond.notify_all()
+            if self.on_frame:
+                self.on_frame(frame.copy())
+            time.sleep(0.002)
+
+    def _reopen(self):
+        try:
+            if self.cap:
+                self.cap.release()
+        except Exception:
+            pass
+        time.sleep(0.15)
+        backend = cv2.CAP_DSHOW if hasattr(cv2, 'CAP_DSHOW') else 0
+        self.cap = cv2.VideoCapture(self.index, backend)
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+
+    def read(self):
+        with self.frame_lock:
+            if self.latest_frame is None:
+                return None
+            return self.latest_frame.copy()
+
+    def read_into(self, pool):
+        """Like read(), but copies into a buffer from `pool` (a FramePool) instead of a new array."""
+        with self.frame_lock:
+            if self.latest_frame is None:
+                return None
+            out = pool.get(self.latest_frame.shape, self.latest_frame.dtype)
+            np.copyto(out, self.latest_frame)
+            return out
+
+    def read_next(self, after_seq=0, timeout=None, newest=True, pool=None):
+        """
+        (seq, timestamp, frame) for a frame with seq > after_seq, waiting up
+        to `timeout` seconds (None = until one arrives, 0 = don't wait).
+        newest=True returns the latest frame (skipping any in between);
+        newest=False returns the oldest one still in the ring, for consumers
+        that want every frame. The frame is a copy (into `pool` if given).
+        Returns None on timeout or when the camera is stopped.
+        """
+        with self.frame_cond:
+            if not self.frame_cond.wait_for(lambda: self.frame_count > after_seq or not self.running, timeout):
+                return None
+            if self.frame_count <= after_seq:
+                return None
+            live = [i for i in range(self.ring_size) if self._seqs[i] > after_seq]
+            if not live:
+                return None
+            pick = max if newest else min
+            i = pick(live, key=lambda j: self._seqs[j])
+            src = self._ring[i]
+            out = pool.get(src.shape, src.dtype) if pool is not None else np.empty_like(src)
+            np.copyto(out, src)
+            return int(self._seqs[i]), float(self._stamps[i]), out
+
+    def stop(self):
+        self.running = False
+        with self.frame_cond:
+            self.frame_cond.notify_all()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=0.5)
+        self.thread = None
+        with self.frame_lock:
+            self._seqs[:] = 0   # a restart must not hand out frames from before the stop
+            self.latest_frame = None
+        try:
+            if self.cap:
+                self.cap.release()
+        except Exception:
+            pass
+        self.cap = None
+
+
+class IPCameraReader:
+    """
+    Same start/read/stop interface as CameraReader for Android IP-Webcam style
+    cameras, fetched on a background thread so the Tk loop never blocks.
+
+    Snapshot URLs (http://<ip>:8080/shot.jpg) reuse one HTTP/1.1 keep-alive
+    connection and request the next snapshot as soon as the previous one has
+    arrived, so a fresh frame is already waiting when the UI asks for it.
+    Stream URLs (http://<ip>:8080/video, any multipart/x-mixed-replace
+    response) are read continuously as MJPEG; no polling at all. Frames that
+    arrive faster than they can be decoded are skipped and counted in
+    `dropped_frames`.
+
+    With lazy_decode=True frames are kept compressed as JpegFrame: callers
+    that only need a detection-size image use read_jpeg().for_detection()
+    (reduced libjpeg decode) and pay for a full decode only when needed.
+    on_frame then receives the JpegFrame instead of an array.
+    """
+
+    def __init__(self, url, timeout=2.5, interval=0.0, lazy_decode=False):
+        self.url = url
+        self.timeout = timeout
+        self.interval = interval    # optional pause between snapshots
+        self.lazy_decode = lazy_decode
+        self.running = False
+        self.frame_lock = threading.Lock()
+        self.frame_cond = threading.Condition(self.frame_lock)   # notified on every new frame
+        self.latest_frame = None
+        self.latest_stamp = 0.0
+        self.thread = None
+        self.on_frame = None
+        self.frame_count = 0
+        self.profiler = None    # optional profiling.Profiler: records "capture" (fetch) and "decode"
+        self.reconnects = 0
+        self.last_fetch_ms = 0.0
+        self._parser = None
+        self._halt = None       # Event that stops the current fetch thread
+
+    def start(self):
+        """(Re)connect to self.url. Never blocks: a previous fetch thread winds down on its own."""
+        self.stop(wait=False)
+        self.running = True
+        self._halt = threading.Event()
+        self._parser = MJPEGStreamParser(lazy=self.lazy_decode)
+        self.thread = threading.Thread(target=self._loop, args=(self.url, self._halt, self._parser), daemon=True)
+        self.thread.start()
+
+    def _connect(self, url):
+        u = urllib.parse.urlsplit(url)
+        cls = http.client.HTTPSConnection if u.scheme == "https" else http.client.HTTPConnection
+        conn = cls(u.hostname, u.port, timeout=self.timeout)
+        path = (u.path or "/") + ("?" + u.query if u.query else "")
+        headers = {"Connection": "keep-alive"}
+        if u.username:
+            token = base64.b64encode(f"{u.username}:{u.password or ''}".encode()).decode()
+            headers["Authorization"] = "Basic " + token
+        return conn, path, headers
+
+    @staticmethod
+    def _close(conn):
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+
+    def _publish(self, frame, halt=None):
+        if halt is not None and halt.is_set():
+            return   # late frame from a connection that was replaced or stopped
+        with self.frame_cond:
+            self.latest_frame = frame
+            self.latest_stamp = time.time()
+            self.frame_count += 1
+            self.frame_cond.notify_all()
+        if self.on_frame:
+            self.on_frame(frame)
+
+    def _loop(self, url, halt, parser):
+        # connection state is local, so a replaced thread cannot touch the new one's
+        conn = None
+        while not halt.is_set():
+            try:
+                if conn is None:
+                    conn, path, headers = self._connect(url)
+                t0 = time.perf_counter()
+                conn.request("GET", path, headers=headers)
+                resp = conn.getresponse()
+                if resp.status != 200:
+                    resp.read()
+                    raise IOError(f"HTTP {resp.status}")
+                if "multipart" in (resp.getheader("Content-Type") or ""):
+                    read_mjpeg(resp, parser, lambda f: self._publish(f, halt), lambda: not halt.is_set())
+                    raise IOError("stream ended")
+                data = resp.read()   # full body read keeps the connection reusable
+                t1 = time.perf_counter()
+                self.last_fetch_ms = (t1 - t0) * 1000.0
+                if self.lazy_decode:
+                    frame = JpegFrame(data)
+                else:
+                    frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+                if self.profiler:
+                    self.profiler.record("capture", self.last_fetch_ms)
+                    if not self.lazy_decode:
+                        self.profiler.record("decode", (time.perf_counter() - t1) * 1000.0)
+                if frame is not None:
+                    self._publish(frame, halt)
+                if self.interval:
+                    halt.wait(self.interval)
+            except Exception:
+                self._close(conn)
+                conn = None
+                if not halt.is_set():
+                    self.reconnects += 1
+                    halt.wait(0.5)
+        self._close(conn)
+
+    @property
+    def dropped_frames(self):
+        return self._parser.dropped if self._parser else 0
+
+    def read(self):
+        with self.frame_lock:
+            frame = self.latest_frame
+        if frame is None:
+            return None
+        if isinstance(frame, JpegFrame):
+            frame = frame.full()   # decoded once per frame, shared by all readers
+            if frame is None:
+                return None
+        return frame.copy()
+
+    def read_next(self, after_seq=0, timeout=None):
+        """
+        (seq, timestamp, frame) for the newest frame with seq > after_seq,
+        waiting up to `timeout` seconds (None = until one arrives), like
+        CameraReader.read_next. Returns None on timeout or when stopped.
+        """
+        with self.frame_cond:
+            if not self.frame_cond.wait_for(lambda: self.frame_count > after_seq or not self.running, timeout):
+                return None
+            if self.frame_count <= after_seq:
+                return None
+            seq, stamp, frame = self.frame_count, self.latest_stamp, self.latest_frame
+        if isinstance(frame, JpegFrame):
+            frame = frame.full()
+            if frame is None:
+                return None
+        return seq, stamp, frame.copy()
+
+    def read_jpeg(self):
+        """Latest frame still compressed (lazy_decode mode only), else None."""
+        with self.frame_lock:
+            frame = self.latest_frame
+        return frame if isinstance(frame, JpegFrame) else None
+
+    def stop(self, wait=True):
+        """Stop fetching; with wait=False the thread is only signalled and exits on its own."""
+        self.running = False
+        if self._halt is not None:
+            self._halt.set()
+        with self.frame_cond:
+            self.frame_cond.notify_all()
+        if wait and self.thread and self.thread.is_alive():
+            self.thread.join(timeout=self.timeout + 0.5)
+        self.thread = None
+
+
+def open_source(source, lazy_decode=False, **kwargs):
+    """'0'/'1'/int -> CameraReader (USB index); http(s) URL -> IPCameraReader."""
+    if isinstance(source, int) or str(source).isdigit():
+        return CameraReader(index=int(source), **kwargs)
+    return IPCameraReader(str(source), lazy_decode=lazy_decode, **kwargs)
@@ -0,0 +1,139 @@
+import csv
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+TIME_FMT = "%Y-%m-%d %H:%M:%S"
+
+
+class CooldownStore:
+    """
+    Per-person attendance cooldown shared by every process on the machine.
+
+    A small SQLite table (WAL mode) holds name -> last mark time (epoch
+    seconds). try_mark() is a single atomic UPSERT on the primary key, so two
+    camera processes that see the same person at once mark them exactly
+    once. Rows older than `ttl_secs` are purged periodically, so the table
+    only ever holds the people inside their cooldown and startup cost does
+    not grow with history. A local dict answers repeat hits from this
+    process without touching the database.
+
+    try_mark() runs on the caller's (UI) thread, so the database is only
+    waited on for `busy_secs`; if it stays locked or fails, the mark is
+    decided by the local dict alone and a duplicate row is the worst case.
+    """
+
+    def __init__(self, path="attendance_cooldown.db", ttl_secs=120, purge_every=256, busy_secs=0.2):
+        self.path = path
+        self.ttl_secs = ttl_secs
+        self.purge_every = purge_every
+        self._local = {}    # name -> last mark seen by this process
+        self._since_purge = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS cooldown (name TEXT PRIMARY KEY, last REAL NOT NULL)")
+        self.purge()
+        self._db.execute(f"PRAGMA busy_timeout = {int(busy_secs * 1000)}")   # setup above may wait longer
+
+    def try_mark(self, name, now=None):
+        """True (and record `now`) unless `name` was marked by any process within ttl_secs."""
+        now = time.time() if now is None else now
+        with self._lock:
+            last = self._local.get(name)
+            if last is not None and now - last < self.ttl_secs:
+                return False
+            try:
+                cur = self._db.execute(
+                    "INSERT INTO cooldown (name, last) VALUES (?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET last = excluded.last "
+                    "WHERE excluded.last - cooldown.last >= ?", (name, now, self.ttl_secs))
+                marked = cur.rowcount == 1
+                if not marked:
+                    row = self._db.execute("SELECT last FROM cooldown WHERE name = ?", (name,)).fetchone()
+                    if row:
+                        self._local[name] = row[0]   # marked by another process
+                self._since_purge += 1
+                if self._since_purge >= self.purge_every:
+                    self._purge_locked(now)
+            except sqlite3.Error as e:
+                self.errors += 1
+                print(f"[cooldown] {self.path} unavailable, using the local cooldown only: {e}")
+                marked = True
+            if marked:
+                self._local[name] = now
+        return marked
+
+    def purge(self, now=None):
+        with self._lock:
+            self._purge_locked(time.time() if now is None else now)
+
+    def _purge_locked(self, now):
+        self._db.execute("DELETE FROM cooldown WHERE last < ?", (now - self.ttl_secs,))
+        self._local = {n: t for n, t in self._local.items() if now - t < self.ttl_secs}
+        self._since_purge = 0
+
+    def seed_from_csv(self, csv_path, now=None, block=1 << 16):
+        """
+        Import marks still inside the cooldown from the end of an attendance
+        CSV (Name, Mobile, Time). The file is read backwards in blocks and
+        reading stops at the first row older than ttl_secs, so a year of
+        history costs the same as an hour. Returns the number of rows seen.
+        """
+        if not os.path.exists(csv_path):
+            return 0
+        now = time.time() if now is None else now
+        cutoff = now - self.ttl_secs
+        recent = {}
+        seen = 0
+        with open(csv_path, "rb") as f:
+            pos = f.seek(0, os.SEEK_END)
+            tail = b""
+            done = False
+            while pos > 0 and not done:
+                step = min(block, pos)
+                pos -= step
+                f.seek(pos)
+                chunk = f.read(step) + tail
+                lines = chunk.split(b"\n")
+                tail = lines.pop(0) if pos > 0 else b""   # may be cut mid-line
+                for line in reversed(lines):
+                    t = self._row_time(line)
+                    if t is None:
+                        continue
+                    if t[1] < cutoff:
+                        done = True
+                        break
+                    seen += 1
+                    recent.setdefault(t[0], t[1])   # newest first
+        with self._lock:
+            self._local.update(recent)   # honoured even if the database write below fails
+            if recent:
+                try:
+                    self._db.execute("BEGIN IMMEDIATE")
+                    self._db.executemany(
+                        "INSERT INTO cooldown (name, last) VALUES (?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET last = max(cooldown.last, excluded.last)",
+                        list(recent.items()))
+                    self._db.execute("COMMIT")
+                except sqlite3.Error as e:
+                    if self._db.in_transaction:
+                        self._db.execute("ROLLBACK")
+                    print(f"[cooldown] could not seed {self.path} from {csv_path}: {e}")
+        return seen
+
+    @staticmethod
+    def _row_time(line):
+        try:
+            row = next(csv.reader([line.decode("utf-8", "replace").strip("\r")]))
+            return row[0], datetime.strptime(row[-1], TIME_FMT).timestamp()
+        except (StopIteration, IndexError, ValueError):
+            return None   # header, blank or malformed line
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,276 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:   # Windows
+    fcntl = None
+    import msvcrt
+
+from gallery_index import EMBED_DIM
+
+
+class EmbeddingStore:
+    """
+    Append-only on-disk gallery that replaces rewriting face_data.json.
+
+        <base>.f32          raw float32 rows, EMBED_DIM per row, memory-mapped
+        <base>.meta.jsonl   one line per event: {"name", "mobile", "image", "row", "sha1"[, "shots"]}
+                            or {"name", "deleted": true}; last line per name wins
+
+    "row" is the embedding matched against; multi-shot enrollments store the
+    centroid there and list the individual shot embeddings' rows in "shots".
+
+    Enrollment appends one row and one metadata line (O(1)); startup maps the
+    vector file without parsing it and only reads the small metadata lines.
+    refresh() reads just the lines other processes appended since, so a
+    running app can follow enrollments made elsewhere on a shared store.
+    Every write (and the startup repair of a torn tail) holds an exclusive
+    lock on <base>.lock, so several processes can append to one store.
+    """
+
+    def __init__(self, base, dim=EMBED_DIM):
+        self.dim = dim
+        self.vec_path = base + ".f32"
+        self.meta_path = base + ".meta.jsonl"
+        self.lock_path = base + ".lock"
+        self.records = {}       # name -> {mobile, image, row, sha1[, shots]}
+        self._rows = 0
+        self._mm = None
+        self._meta_pos = 0      # bytes of the metadata file already applied
+        self._meta_id = None    # inode of that file; changes if it is replaced wholesale
+        self._lock = threading.Lock()
+        self._load()
+
+    def exists(self):
+        return os.path.exists(self.meta_path)
+
+    @contextlib.contextmanager
+    def _writer(self, shared=False):
+        """
+        Exclusive cross-process lock held around every write to the store
+        files; shared=True lets a full reload wait out writers (exclusive
+        on Windows, where msvcrt has no shared mode).
+        """
+        with open(self.lock_path, "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        time.sleep(0.05)   # another process is writing
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _load(self, repair=True):
+        """
+        (Re)read both files. With repair, a torn tail left by a crashed writer
+        is cut off first, under the writer lock so no live append is touched.
+        """
+        if repair:
+            with self._writer():
+                self._read_files(repair=True)
+        else:
+            self._read_files(repair=False)
+
+    def _read_files(self, repair):
+        row_bytes = self.dim * 4
+        size = os.path.getsize(self.vec_path) if os.path.exists(self.vec_path) else 0
+        self._rows = size // row_bytes   # a torn trailing write is ignored
+        if repair and size % row_bytes:
+            with open(self.vec_path, "r+b") as f:
+                f.truncate(self._rows * row_bytes)
+        self.records.clear()   # in place: callers keep a reference to records
+        self._meta_pos = 0
+        self._meta_id = None
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "rb") as f:
+                data = f.read()
+                self._meta_id = os.fstat(f.fileno()).st_ino
+            if repair and data and not data.endswith(b"\n"):
+                with open(self.meta_path, "ab") as f:
+                    f.write(b"\n")   # so the next append starts on a fresh line
+                data += b"\n"
+            self._meta_pos = self._read_meta(data)
+        self._mm = None
+
+    def _read_meta(self, data, wait_for_rows=False):
+        """
+        Apply the complete metadata lines in `data` to records; returns the
+        bytes consumed. With wait_for_rows, stop before a line whose vector
+        row is not visible yet (another writer, or a slow network share).
+        """
+        end = data.rfind(b"\n") + 1
+        pos = 0
+        while pos < end:
+            nl = data.index(b"\n", pos) + 1
+            line, start, pos = data[pos:nl], pos, nl
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # torn line after a crash
+            name = rec.get("name")
+            if not name:
+                continue
+            if rec.get("deleted"):
+                self.records.pop(name, None)
+            elif 0 <= rec.get("row", -1) < self._rows:
+                self.records[name] = {"mobile": rec.get("mobile", ""), "image": rec.get("image", ""),
+                                      "row": rec["row"], "sha1": rec.get("sha1")}
+                shots = [r for r in rec.get("shots") or [] if 0 <= r < self._rows]
+                if shots:
+                    self.records[name]["shots"] = shots
+            elif wait_for_rows and rec.get("row", -1) >= self._rows:
+                return start
+        return end
+
+    def refresh(self):
+        """
+        Apply what other processes wrote since the last load/refresh.
+        Returns ({name: row} added or changed, [names removed]). A metadata
+        file replaced wholesale is reloaded whole (under a shared lock) and
+        diffed; a missing or shrunken one is treated as no change, never as
+        every identity removed.
+        """
+        with self._lock:
+            before = {n: r["row"] for n, r in self.records.items()}
+            try:
+                st = os.stat(self.meta_path)
+            except FileNotFoundError:
+                st = None
+            if st is None or (st.st_ino == self._meta_id and st.st_size < self._meta_pos):
+                pass   # mid-rewrite or deleted by hand: keep serving what we have
+            elif st.st_ino != self._meta_id:
+                with self._writer(shared=True):
+                    self._load(repair=False)
+            elif st.st_size > self._meta_pos:
+                size = os.path.getsize(self.vec_path) if os.path.exists(self.vec_path) else 0
+                self._rows = max(self._rows, size // (self.dim * 4))
+                with open(self.meta_path, "rb") as f:
+                    f.seek(self._meta_pos)
+                    data = f.read()
+                self._meta_pos += self._read_meta(data, wait_for_rows=True)
+            after = {n: r["row"] for n, r in self.records.items()}
+        changed = {n: row for n, row in after.items() if before.get(n) != row}
+        return changed, [n for n in before if n not in after]
+
+    def vectors(self):
+        """(rows, dim) float32 memmap over every row ever written (live rows via records)."""
+        with self._lock:
+            if self._rows == 0:
+                return np.zeros((0, self.dim), dtype=np.float32)
+            if self._mm is None or len(self._mm) != self._rows:
+                self._mm = np.memmap(self.vec_path, dtype=np.float32, mode="r", shape=(self._rows, self.dim))
+            return self._mm
+
+    def get(self, name):
+        rec = self.records.get(name)
+        return None if rec is None else np.asarray(self.vectors()[rec["row"]])
+
+    def get_shots(self, name):
+        """(k, dim) per-shot embeddings of a multi-shot enrollment (empty if there are none)."""
+        rec = self.records.get(name)
+        if rec is None or not rec.get("shots"):
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.asarray(self.vectors()[rec["shots"]])
+
+    def hashes(self):
+        """Content hashes of the source images behind live records."""
+        return {r["sha1"] for r in self.records.values() if r.get("sha1")}
+
+    def items(self):
+        """Yield (name, record, embedding) for every live identity."""
+        vecs = self.vectors()
+        for name, rec in list(self.records.items()):
+            yield name, rec, vecs[rec["row"]]
+
+    def _append_meta(self, lines):
+        with open(self.meta_path, "a", encoding="utf-8") as f:
+            for rec in lines:
+                f.write(json.dumps(rec) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def append_many(self, entries):
+        """entries: iterable of (name, mobile, image, enc[, sha1[, shots]]). One write per file."""
+        entries = list(entries)
+        if not entries:
+            return
+        with self._lock, self._writer():
+            self._append_locked(entries)
+
+    def _append_locked(self, entries):
+        # caller holds self._lock and the writer lock
+        row_bytes = self.dim * 4
+        blocks, layout, n = [], [], 0
+        for e in entries:
+            shots = e[5] if len(e) > 5 and e[5] is not None else ()
+            shots = np.asarray(shots, dtype=np.float32).reshape(-1, self.dim)
+            blocks.append(np.asarray(e[3], dtype=np.float32).reshape(1, self.dim))
+            blocks.append(shots)
+            layout.append((n, list(range(n + 1, n + 1 + len(shots)))))
+            n += 1 + len(shots)
+        vecs = np.concatenate(blocks)
+        with open(self.vec_path, "ab") as f:
+            end = f.tell()   # includes rows other processes appended
+            if end % row_bytes:
+                f.truncate(end - end % row_bytes)   # torn tail of a crashed writer (we hold the lock)
+            start = end // row_bytes
+            f.write(vecs.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        lines = []
+        for e, (row, shot_rows) in zip(entries, layout):
+            name, mobile, image = e[:3]
+            rec = {"mobile": mobile, "image": image, "row": start + row, "sha1": e[4] if len(e) > 4 else None}
+            if shot_rows:
+                rec["shots"] = [start + r for r in shot_rows]
+            self.records[name] = rec
+            lines.append(dict(name=name, **rec))
+        self._rows = start + n
+        self._append_meta(lines)
+
+    def append(self, name, mobile, image, enc, sha1=None, shots=None):
+        self.append_many([(name, mobile, image, enc, sha1, shots)])
+
+    def remove(self, name):
+        with self._lock:
+            if self.records.pop(name, None) is None:
+                return False
+            with self._writer():
+                self._append_meta([{"name": name, "deleted": True}])
+            return True
+
+    def migrate_from_json(self, json_path):
+        """
+        One-time import of a legacy face_data.json ({name: {mobile, image, enc}}).
+        Entries without a valid 128-d 'enc' are skipped. Returns rows imported.
+        """
+        if not os.path.exists(json_path):
+            return 0
+        with open(json_path, "r") as f:
+            data = json.load(f)
+        entries = [
+            (name, info.get("mobile", ""), info.get("image", ""), info["enc"])
+            for name, info in data.items()
+            if isinstance(info, dict) and len(info.get("enc") or []) == self.dim
+        ]
+        self.append_many(entries)
+        if not self.exists():
+            self._append_meta([])   # mark as migrated even if the JSON was empty
+        return len(entries)
@@ -0,0 +1,126 @@
+import contextlib
+import multiprocessing as mp
+import sys
+import threading
+import warnings
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# ---------------- Worker side ----------------
+_attached = {}   # shm name -> SharedMemory, kept open for the worker's lifetime
+
+
+def _attach(name):
+    shm = _attached.get(name)
+    if shm is None:
+        for old in _attached.values():
+            old.close()   # parent re-allocated a bigger block
+        _attached.clear()
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)   # Python 3.13+
+        except TypeError:
+            # spawned workers share the parent's resource tracker, and the parent unlinks
+            shm = shared_memory.SharedMemory(name=name)
+        _attached[name] = shm
+    return shm
+
+
+def _encode_chunk(job):
+    # workers skip the entry script (and its warning filter); scoped to this import
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message=".pkg_resources is deprecated as an API.",
+                                category=UserWarning, module="face_recognition_models")
+        import face_recognition
+    name, shape, boxes = job
+    shm = _attach(name)
+    frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    return [np.asarray(e, dtype=np.float32) for e in face_recognition.face_encodings(frame, boxes)]
+
+
+@contextlib.contextmanager
+def _no_main_reimport():
+    # Under the "spawn" start method (Windows) children re-run the parent's
+    # __main__ script, which for the Tk apps would open a window per worker.
+    # Hiding __file__ while the pool starts makes them import only this module.
+    main = sys.modules.get("__main__")
+    path = getattr(main, "__file__", None)
+    if path is not None:
+        del main.__file__
+    try:
+        yield
+    finally:
+        if path is not None:
+            main.__file__ = path
+
+
+# ---------------- Parent side ----------------
+class EncodePool:
+    """
+    Encode many face boxes of one frame in parallel.
+
+    The RGB frame is copied once into a shared-memory block; workers map the
+    same block and receive only (shm name, shape, box list), so no frame is
+    pickled. Boxes are split into contiguous chunks, one per worker, and the
+    embeddings come back in the original box order. Frames with fewer than
+    `min_parallel` faces are encoded in-process (IPC would cost more).
+    """
+
+    def __init__(self, workers=None, min_parallel=3):
+        self.workers = workers or max(1, mp.cpu_count() - 1)
+        self.min_parallel = min_parallel
+        self._pool = None
+        self._shm = None
+        self._lock = threading.Lock()   # one frame in the shared block at a time
+
+    def start(self):
+        if self._pool is None:
+            with _no_main_reimport():
+                self._pool = mp.get_context("spawn").Pool(self.workers)
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.terminate()
+                self._pool.join()
+                self._pool = None
+            if self._shm is not None:
+                self._shm.close()
+                self._shm.unlink()
+                self._shm = None
+
+    def _frame_block(self, nbytes):
+        if self._shm is None or self._shm.size < nbytes:
+            if self._shm is not None:
+                self._shm.close()
+                self._shm.unlink()
+            self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        return self._shm
+
+    def encode(self, rgb_frame, boxes):
+        """Same result as face_recognition.face_encodings(rgb_frame, boxes)."""
+        boxes = list(boxes)
+        if not boxes:
+            return []
+        if len(boxes) < self.min_parallel or self.workers < 2:
+            import face_recognition
+            return face_recognition.face_encodings(rgb_frame, boxes)
+        self.start()
+        frame = np.ascontiguousarray(rgb_frame, dtype=np.uint8)
+        with self._lock:
+            shm = self._frame_block(frame.nbytes)
+            np.ndarray(frame.shape, dtype=np.uint8, buffer=shm.buf)[...] = frame
+            n = min(self.workers, len(boxes))
+            chunks = [c.tolist() for c in np.array_split(np.arange(len(boxes)), n)]
+            jobs = [(shm.name, frame.shape, [boxes[i] for i in c]) for c in chunks]
+            out = []
+            for part in self._pool.map(_encode_chunk, jobs):
+                out.extend(part)
+        return out
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,115 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from file_hash import file_sha1
+
+
+def default_model_version(upsample=1, num_jitters=1):
+    """Identifies what produced an encoding: model/dlib versions plus the encode settings."""
+    try:
+        import face_recognition_models
+        models = getattr(face_recognition_models, "__version__", "unknown")
+    except ImportError:
+        models = "unknown"
+    try:
+        import dlib
+        dlib_ver = getattr(dlib, "__version__", "unknown")
+    except ImportError:
+        dlib_ver = "unknown"
+    return f"face_recognition_models-{models}/dlib-{dlib_ver}/hog-up{upsample}/jitter{num_jitters}"
+
+
+class EncodingCache:
+    """
+    Persistent cache of known_faces encodings, so startup and the reload
+    after an enrollment only encode images that are new or changed.
+
+    Encodings are keyed by the SHA-1 of the image bytes; the whole cache is
+    tied to `model_version` and dropped when that changes. Files are only
+    re-hashed when their size or mtime differs from the last run, so a
+    warm start is one stat() per image. retain() forgets files that are no
+    longer enrolled (and encodings no file refers to any more); a replaced
+    file gets a new hash and is encoded again. Saved atomically as JSON.
+    """
+
+    def __init__(self, path="known_faces.cache.json", model_version=None):
+        self.path = path
+        self.model_version = model_version or default_model_version()
+        self.files = {}      # image path -> [size, mtime_ns, sha1]
+        self.encodings = {}  # sha1 -> list of encodings (empty = no face found)
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[encoding_cache] ignoring unreadable {self.path}: {e}")
+            return
+        if data.get("model") != self.model_version:
+            print(f"[encoding_cache] model changed ({data.get('model')} -> {self.model_version}); re-encoding")
+            self._dirty = True
+            return
+        self.files = data.get("files", {})
+        self.encodings = {h: [np.asarray(e) for e in encs] for h, encs in data.get("encodings", {}).items()}
+
+    def sha1(self, img_path):
+        """Content hash of `img_path`, re-read only when its size or mtime changed."""
+        st = os.stat(img_path)
+        entry = self.files.get(img_path)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+        digest = file_sha1(img_path)
+        self.files[img_path] = [st.st_size, st.st_mtime_ns, digest]
+        self._dirty = True
+        return digest
+
+    def get(self, img_path, encode):
+        """Encodings of `img_path`; encode(img_path) -> list of encodings is only called on a miss."""
+        with self._lock:
+            digest = self.sha1(img_path)
+            encs = self.encodings.get(digest)
+            if encs is not None:
+                self.hits += 1
+                return encs
+        encs = [np.asarray(e) for e in encode(img_path)]
+        with self._lock:
+            self.encodings[digest] = encs
+            self.misses += 1
+            self._dirty = True
+        return encs
+
+    def retain(self, img_paths):
+        """Forget every file not in `img_paths` and every encoding no remaining file refers to."""
+        keep = set(img_paths)
+        with self._lock:
+            gone = [p for p in self.files if p not in keep]
+            for p in gone:
+                del self.files[p]
+            live = {entry[2] for entry in self.files.values()}
+            stale = [h for h in self.encodings if h not in live]
+            for h in stale:
+                del self.encodings[h]
+            if gone or stale:
+                self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"model": self.model_version, "files": dict(self.files),
+                    "encodings": {h: [np.asarray(e).tolist() for e in encs] for h, encs in self.encodings.items()}}
+            self._dirty = False
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)   # a crash mid-save leaves the previous cache intact
@@ -0,0 +1,100 @@
+import heapq
+import itertools
+import queue
+import threading
+import time
+
+import numpy as np
+
+from face_quality import sharpness
+
+
+class EnrollmentJob:
+    """
+    Multi-shot enrollment fed by the recognition worker instead of its own
+    capture loop, so the Tk thread never blocks.
+
+    While the job is open the worker calls offer() with the face it already
+    detected and encoded; the job keeps the `shots` sharpest crops (Laplacian
+    variance) and finishes early once all of them reach `good_blur`, or at
+    `timeout_secs`. The result holds the centroid of the kept embeddings
+    (shots further than `max_spread` from the median embedding are dropped
+    as outliers, e.g. someone walking through) plus the per-shot embeddings.
+
+    Progress is reported on `progress` (a queue.Queue) for the UI to drain:
+        ("progress", shots_kept, shots_wanted, sharpness)
+        ("done", result)      result: dict centroid, encodings, blurs, crop, blur
+        ("failed", reason)
+    """
+
+    def __init__(self, name, mobile, shots=5, timeout_secs=8.0, good_blur=240.0, max_spread=0.35):
+        self.name = name
+        self.mobile = mobile
+        self.shots_wanted = shots
+        self.deadline = time.time() + timeout_secs
+        self.good_blur = good_blur
+        self.max_spread = max_spread
+        self.progress = queue.Queue()
+        self.done = False
+        self.offered = 0
+        self._heap = []     # min-heap (blur, tiebreak, crop_rgb, enc) of the sharpest shots
+        self._tiebreak = itertools.count()
+        self._lock = threading.Lock()
+
+    def offer(self, rgb_full, box, enc, now=None):
+        """Worker side: one quality-checked face (full-frame RGB, box, 128-d encoding)."""
+        if self.done:
+            return
+        now = time.time() if now is None else now
+        t, r, b, l = box
+        blur = sharpness(rgb_full, box)    # cached by the quality gate for this frame
+        crop = rgb_full[t:b, l:r].copy()   # don't keep the whole frame alive
+        item = (blur, next(self._tiebreak), crop, np.asarray(enc, dtype=np.float32))
+        with self._lock:
+            self.offered += 1
+            if len(self._heap) < self.shots_wanted:
+                heapq.heappush(self._heap, item)
+            elif blur > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+            kept = len(self._heap)
+            sharp_enough = kept == self.shots_wanted and self._heap[0][0] >= self.good_blur
+        self.progress.put(("progress", kept, self.shots_wanted, blur))
+        if sharp_enough or now >= self.deadline:
+            self.finish()
+
+    def check_timeout(self, now=None):
+        """UI side: close the job at its deadline even if no face was offered."""
+        now = time.time() if now is None else now
+        if not self.done and now >= self.deadline:
+            self.finish()
+
+    def cancel(self):
+        with self._lock:
+            if self.done:
+                return
+            self.done = True
+        self.progress.put(("failed", "cancelled"))
+
+    def finish(self):
+        with self._lock:
+            if self.done:
+                return
+            self.done = True
+            shots = sorted(self._heap, reverse=True)
+        if not shots:
+            self.progress.put(("failed", "no high-quality face captured"))
+            return
+        encs = np.stack([s[3] for s in shots])
+        # coordinate-wise median is robust to a minority of outlier shots
+        spread = np.linalg.norm(encs - np.median(encs, axis=0), axis=1)
+        keep = spread <= self.max_spread
+        keep[np.argmin(spread)] = True
+        shots = [s for s, k in zip(shots, keep) if k]
+        encs = encs[keep]
+        self.progress.put(("done", {
+            "centroid": encs.mean(axis=0),
+            "encodings": encs,
+            "blurs": [s[0] for s in shots],
+            "crop": shots[0][2],
+            "blur": shots[0][0],
+        }))
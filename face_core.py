@@ -0,0 +1,13 @@
+from face_quality import face_quality_ok   # re-exported for the recognition loops
+
+
+def map_boxes(scale, boxes):
+    """Map (top, right, bottom, left) boxes found on a `scale`-resized image back to full size."""
+    if scale == 1.0:
+        return boxes
+    mapped = []
+    inv = 1.0 / scale
+    for (t, r, b, l) in boxes:
+        mapped.append((int(t*inv), int(r*inv), int(b*inv), int(l*inv)))
+    return mapped
+
@@ -0,0 +1,155 @@
+import os
+import threading
+
+import cv2
+import face_recognition
+import numpy as np
+
+MODEL_DIR = "models"
+DNN_CONFIG = os.path.join(MODEL_DIR, "deploy.prototxt")
+DNN_MODEL = os.path.join(MODEL_DIR, "res10_300x300_ssd_iter_140000.caffemodel")
+YUNET_MODEL = os.path.join(MODEL_DIR, "face_detection_yunet_2023mar.onnx")
+LBP_CASCADE = os.path.join(MODEL_DIR, "lbpcascade_frontalface_improved.xml")
+
+DETECTOR_KINDS = ("hog", "haar", "lbp", "dnn", "yunet")
+
+
+def _clip_box(x, y, w, h, width, height):
+    """(x, y, w, h) -> (top, right, bottom, left) inside the image, or None if empty."""
+    l, t = max(0, int(x)), max(0, int(y))
+    r, b = min(width, int(x + w)), min(height, int(y + h))
+    if r <= l or b <= t:
+        return None
+    return t, r, b, l
+
+
+class HogDetector:
+    """dlib HOG via face_recognition, the detector the apps have always used."""
+
+    name = "hog"
+
+    def __init__(self, upsample=0):
+        self.upsample = upsample
+
+    def detect(self, rgb):
+        return face_recognition.face_locations(rgb, number_of_times_to_upsample=self.upsample, model="hog")
+
+
+class CascadeDetector:
+    """
+    Viola-Jones cascade (cv2.CascadeClassifier): Haar is OpenCV's bundled
+    frontal-face model, LBP needs a local .xml but is several times faster
+    again. Much cheaper than HOG on small frames, weaker on tilted faces.
+    `min_size` is in pixels of the image passed to detect().
+    """
+
+    def __init__(self, path=None, scale_factor=1.1, min_neighbors=5, min_size=20, name="haar"):
+        if not hasattr(cv2, "CascadeClassifier"):
+            raise ValueError("this OpenCV build has no CascadeClassifier (OpenCV 5 moved it to opencv-contrib-python)")
+        self.path = path or os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+        self.name = name
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = (min_size, min_size)
+        self._cascade = cv2.CascadeClassifier(self.path)
+        if self._cascade.empty():
+            raise ValueError(f"cannot load cascade {self.path}")
+        self._lock = threading.Lock()   # a classifier is not safe to share between threads
+
+    def detect(self, rgb):
+        gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+        with self._lock:
+            found = self._cascade.detectMultiScale(gray, scaleFactor=self.scale_factor,
+                                                   minNeighbors=self.min_neighbors, minSize=self.min_size)
+        h, w = gray.shape
+        return [box for box in (_clip_box(x, y, bw, bh, w, h) for (x, y, bw, bh) in found) if box]
+
+
+class DnnDetector:
+    """
+    OpenCV's ResNet-10 SSD face detector (cv2.dnn) from local model files:
+    deploy.prototxt + res10_300x300_ssd_iter_140000.caffemodel, or the
+    TensorFlow opencv_face_detector .pbtxt/.pb pair. Runs at a fixed
+    300x300 input, so cost barely depends on frame size.
+    """
+
+    name = "dnn"
+
+    def __init__(self, config=DNN_CONFIG, model=DNN_MODEL, confidence=0.6, size=300):
+        for p in (config, model):
+            if not os.path.exists(p):
+                raise ValueError(f"missing detector model file {p}")
+        self.confidence = confidence
+        self.size = size
+        self._net = cv2.dnn.readNet(model, config)
+        self._lock = threading.Lock()
+
+    def detect(self, rgb):
+        h, w = rgb.shape[:2]
+        # trained on BGR with these channel means; swapRB turns our RGB back into BGR
+        blob = cv2.dnn.blobFromImage(rgb, 1.0, (self.size, self.size), (104.0, 177.0, 123.0), swapRB=True)
+        with self._lock:
+            self._net.setInput(blob)
+            out = self._net.forward()
+        boxes = []
+        for det in out.reshape(-1, 7):
+            if det[2] < self.confidence:
+                continue
+            x0, y0, x1, y1 = det[3:7] * np.array([w, h, w, h])
+            box = _clip_box(x0, y0, x1 - x0, y1 - y0, w, h)
+            if box:
+                boxes.append(box)
+        return boxes
+
+
+class YuNetDetector:
+    """OpenCV's YuNet CNN (cv2.FaceDetectorYN, OpenCV >= 4.5.4) from a local .onnx file."""
+
+    name = "yunet"
+
+    def __init__(self, model=YUNET_MODEL, confidence=0.8, nms=0.3):
+        if not hasattr(cv2, "FaceDetectorYN"):
+            raise ValueError("this OpenCV build has no FaceDetectorYN (need >= 4.5.4)")
+        if not os.path.exists(model):
+            raise ValueError(f"missing detector model file {model}")
+        self._net = cv2.FaceDetectorYN.create(model, "", (320, 320), confidence, nms)
+        self._size = None
+        self._lock = threading.Lock()
+
+    def detect(self, rgb):
+        h, w = rgb.shape[:2]
+        bgr = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+        with self._lock:
+            if self._size != (w, h):
+                self._net.setInputSize((w, h))
+                self._size = (w, h)
+            _, faces = self._net.detect(bgr)
+        if faces is None:
+            return []
+        return [box for box in (_clip_box(*f[:4], w, h) for f in faces) if box]
+
+
+def make_detector(spec="hog", upsample=0):
+    """
+    Build a detector from a spec string:
+      hog                      dlib HOG (upsample = face_locations upsampling)
+      haar[:cascade.xml]       Haar cascade, OpenCV's bundled frontal face by default
+      lbp[:cascade.xml]        LBP cascade (default models/lbpcascade_frontalface_improved.xml)
+      dnn[:config,model]       ResNet SSD (default models/deploy.prototxt + res10 caffemodel)
+      yunet[:model.onnx]       YuNet (default models/face_detection_yunet_2023mar.onnx)
+    Every detector returns (top, right, bottom, left) boxes for an RGB image.
+    """
+    kind, _, arg = (spec or "hog").partition(":")
+    paths = [p for p in arg.split(",") if p]
+    kind = kind.lower()
+    if kind == "hog":
+        return HogDetector(upsample)
+    if kind == "haar":
+        return CascadeDetector(paths[0] if paths else None)
+    if kind == "lbp":
+        return CascadeDetector(paths[0] if paths else LBP_CASCADE, name="lbp")
+    if kind == "dnn":
+        return DnnDetector(*paths[:2]) if len(paths) >= 2 else DnnDetector()
+    if kind == "yunet":
+        return YuNetDetector(paths[0]) if paths else YuNetDetector()
+    raise ValueError(f"unknown detector {spec!r} (choose from {', '.join(DETECTOR_KINDS)})")
@@ -0,0 +1,73 @@
+import threading
+import weakref
+
+import cv2
+
+
+class _FrameCache:
+    """
+    Grayscale copy and per-box sharpness scores of the last few frames.
+
+    Entries are keyed by the frame array itself (held through a weakref, so a
+    frame that is garbage-collected drops its entry). Frames must not be
+    modified in place after they were scored.
+    """
+
+    def __init__(self, size=4):
+        self.size = size
+        self._entries = {}    # id(frame) -> [weakref(frame), gray, {box: score}]
+        self._order = []
+        self._lock = threading.Lock()
+
+    def entry(self, rgb_frame):
+        key = id(rgb_frame)
+        with self._lock:
+            ent = self._entries.get(key)
+            if ent is not None and ent[0]() is rgb_frame:
+                return ent
+        gray = cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2GRAY)
+        ent = [weakref.ref(rgb_frame, lambda _, k=key: self._drop(k)), gray, {}]
+        with self._lock:
+            self._entries[key] = ent
+            self._order = [k for k in self._order if k != key] + [key]
+            while len(self._order) > self.size:
+                self._entries.pop(self._order.pop(0), None)
+        return ent
+
+    def _drop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._order = [k for k in self._order if k != key]
+
+
+_cache = _FrameCache()
+
+
+def sharpness(rgb_frame, box):
+    """
+    Laplacian variance of the (top, right, bottom, left) box, computed on an
+    ROI view of the shared gray frame. Same value as running cvtColor +
+    Laplacian().var() on the crop; cached per frame and box.
+    """
+    ent = _cache.entry(rgb_frame)
+    box = tuple(int(v) for v in box)
+    score = ent[2].get(box)
+    if score is None:
+        top, right, bottom, left = box
+        roi = ent[1][max(0, top):bottom, max(0, left):right]
+        if roi.size == 0:
+            score = 0.0
+        else:
+            # uint8 input: CV_32F Laplacian values are exact; meanStdDev accumulates in double
+            _, std = cv2.meanStdDev(cv2.Laplacian(roi, cv2.CV_32F))
+            score = float(std[0, 0]) ** 2
+        ent[2][box] = score
+    return score
+
+
+def face_quality_ok(rgb_frame, box, min_size=80, min_blur=120.0):
+    top, right, bottom, left = box
+    w, h = right - left, bottom - top
+    if w < min_size or h < min_size:
+        return False
+    return sharpness(rgb_frame, box) >= min_blur
@@ -0,0 +1,121 @@
+import itertools
+import threading
+import time
+
+
+def box_iou(a, b):
+    """IoU of two (top, right, bottom, left) boxes."""
+    t, r = max(a[0], b[0]), min(a[1], b[1])
+    bt, l = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, r - l) * max(0, bt - t)
+    if inter == 0:
+        return 0.0
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return inter / float(area_a + area_b - inter)
+
+
+class Track:
+    def __init__(self, track_id, box, now):
+        self.id = track_id
+        self.box = box
+        self.first_seen = now
+        self.last_seen = now
+        self.name = None          # None until the first successful encode+match
+        self.distance = 1.0
+        self.encoded_box = None   # box at the last encode
+        self.encoded_at = 0.0
+
+    def needs_encoding(self, now, reencode_iou, reverify_secs):
+        if self.name is None or self.encoded_box is None:
+            return True
+        if box_iou(self.box, self.encoded_box) < reencode_iou:
+            return True   # moved / resized a lot since we last looked
+        return (now - self.encoded_at) >= reverify_secs
+
+    def set_identity(self, name, distance, now):
+        self.name = name
+        self.distance = distance
+        self.encoded_box = self.box
+        self.encoded_at = now
+
+
+class FaceTracker:
+    """
+    Greedy IoU tracker for detected face boxes.
+
+    update() associates the new detections with live tracks (highest IoU
+    first, >= iou_match) and returns one Track per box, in box order. Tracks
+    not seen for ttl_secs are dropped. A track only needs a fresh 128-d encode
+    when it is new, its box drifted below reencode_iou against the box it was
+    encoded at, or reverify_secs have passed; otherwise its cached identity is
+    reused, so encoding cost follows new arrivals rather than crowd size.
+    """
+
+    def __init__(self, iou_match=0.3, ttl_secs=1.0, reencode_iou=0.5, reverify_secs=3.0):
+        self.iou_match = iou_match
+        self.ttl_secs = ttl_secs
+        self.reencode_iou = reencode_iou
+        self.reverify_secs = reverify_secs
+        self.tracks = {}
+        self.encoded = 0
+        self.reused = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def update(self, boxes, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            for tid in [tid for tid, t in self.tracks.items() if now - t.last_seen > self.ttl_secs]:
+                del self.tracks[tid]
+
+            pairs = []
+            for bi, box in enumerate(boxes):
+                for tid, t in self.tracks.items():
+                    iou = box_iou(box, t.box)
+                    if iou >= self.iou_match:
+                        pairs.append((iou, bi, tid))
+            pairs.sort(reverse=True)
+
+            assigned = [None] * len(boxes)
+            used = set()
+            for iou, bi, tid in pairs:
+                if assigned[bi] is None and tid not in used:
+                    assigned[bi] = self.tracks[tid]
+                    used.add(tid)
+
+            for bi, box in enumerate(boxes):
+                t = assigned[bi]
+                if t is None:
+                    t = Track(next(self._ids), box, now)
+                    self.tracks[t.id] = t
+                    assigned[bi] = t
+                t.box = box
+                t.last_seen = now
+            return assigned
+
+    def boxes(self):
+        """Last box of every live track (search windows for ROI detection)."""
+        with self._lock:
+            return [t.box for t in self.tracks.values()]
+
+    def forget_identities(self, names=()):
+        """
+        Re-encode tracks labelled "Unknown" or one of `names` on their next
+        detection, so an enrollment or gallery reload shows at once instead of
+        after reverify_secs. The old label stays up until then.
+        """
+        names = set(names) | {"Unknown"}
+        with self._lock:
+            for t in self.tracks.values():
+                if t.name in names:
+                    t.encoded_box = None
+
+    def needs_encoding(self, track, now=None):
+        now = time.time() if now is None else now
+        need = track.needs_encoding(now, self.reencode_iou, self.reverify_secs)
+        if need:
+            self.encoded += 1
+        else:
+            self.reused += 1
+        return need
@@ -0,0 +1,60 @@
+import cv2
+import numpy as np
+
+# libjpeg can decode straight to 1/2, 1/4 or 1/8 size (DCT scaling), which is
+# far cheaper than a full decode followed by cv2.resize.
+_REDUCED = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def reduced_factor(scale):
+    """Largest libjpeg reduction (1, 2, 4, 8) that still gives at least `scale` of full size."""
+    for f in (8, 4, 2):
+        if 1.0 / f >= scale - 1e-6:
+            return f
+    return 1
+
+
+class JpegFrame:
+    """
+    One compressed camera frame with lazy, cached decodes.
+
+    for_detection(scale) decodes directly at a reduced size for face
+    detection; full() is only paid for when a frame actually has faces to
+    encode (or has to be displayed). Each size is decoded at most once.
+    """
+
+    __slots__ = ("data", "_cache")
+
+    def __init__(self, data):
+        self.data = np.frombuffer(data, dtype=np.uint8)
+        self._cache = {}
+
+    def decode(self, factor=1):
+        img = self._cache.get(factor)
+        if img is None:
+            img = cv2.imdecode(self.data, _REDUCED[factor])
+            self._cache[factor] = img
+        return img
+
+    def full(self):
+        return self.decode(1)
+
+    def for_detection(self, scale):
+        """
+        BGR image at ~`scale` of full size and the exact scale it represents
+        (pass that to map_boxes). None, 0.0 if the JPEG is corrupt.
+        """
+        f = reduced_factor(scale)
+        img = self.decode(f)
+        if img is None:
+            return None, 0.0
+        rest = scale * f
+        if abs(rest - 1.0) > 0.01:
+            img = cv2.resize(img, (0, 0), fx=rest, fy=rest, interpolation=cv2.INTER_AREA)
+            return img, scale
+        return img, 1.0 / f
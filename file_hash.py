@@ -0,0 +1,10 @@
+import hashlib
+
+
+def file_sha1(path, chunk=1 << 20):
+    """Hex SHA-1 of a file's bytes, read in `chunk`-sized blocks."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
@@ -0,0 +1,163 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+# inotify(7) event bits: anything that adds, rewrites, renames or deletes an entry
+_IN_MODIFY = 0x002
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+_EVENT = struct.Struct("iIII")   # struct inotify_event: wd, mask, cookie, len (name follows)
+
+
+def _inotify_fd(dirs):
+    """Non-blocking inotify fd watching `dirs` (Linux, via libc) and its {wd: dir}, or (None, {})."""
+    if not sys.platform.startswith("linux"):
+        return None, {}
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None, {}
+    if fd < 0:
+        return None, {}
+    wds = {}
+    for d in dirs:
+        wd = libc.inotify_add_watch(fd, os.fsencode(d), _IN_MASK)
+        if wd >= 0:
+            wds[wd] = d
+    if not wds:
+        os.close(fd)
+        return None, {}
+    return fd, wds
+
+
+class FileWatcher:
+    """
+    Calls on_change() on a daemon thread when any of `paths` (files or
+    directories) is created, rewritten, appended to or deleted.
+
+    On Linux inotify on the parent directories wakes the thread as soon as
+    something is written; elsewhere (and as a safety net, since inotify
+    misses writes made by other machines on network shares) the size/mtime
+    of every path is polled every `poll_secs`. Events for other files in
+    those directories are ignored. Changes are reported once the paths'
+    size/mtime has held still for `settle_secs`, so one enrollment writing
+    two files fires once.
+    """
+
+    def __init__(self, paths, on_change, poll_secs=2.0, settle_secs=0.3, use_inotify=True):
+        self.paths = [os.path.abspath(p) for p in paths]
+        self.on_change = on_change
+        self.poll_secs = poll_secs
+        self.settle_secs = settle_secs
+        self.use_inotify = use_inotify
+        self.changes = 0
+        self.backend = None
+        self._fd = None
+        self._wds = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def signature(self):
+        sig = []
+        for p in self.paths:
+            try:
+                st = os.stat(p)
+                sig.append((st.st_ino, st.st_size, st.st_mtime_ns))
+            except OSError:
+                sig.append(None)
+        return sig
+
+    def start(self):
+        if self.use_inotify:
+            dirs = {p if os.path.isdir(p) else os.path.dirname(p) for p in self.paths}
+            self._fd, self._wds = _inotify_fd(sorted(d for d in dirs if os.path.isdir(d)))
+        self.backend = "inotify" if self._fd is not None else "polling"
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def _wait(self, timeout):
+        """Sleep up to `timeout`; True once inotify reports activity on one of `paths`."""
+        if self._fd is None:
+            self._stop.wait(timeout)
+            return False
+        deadline = time.monotonic() + timeout
+        while not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            ready, _, _ = select.select([self._fd], [], [], remaining)
+            if not ready:
+                return False
+            if self._relevant(self._drain()):
+                return True
+        return False
+
+    def _drain(self):
+        """Every (wd, name) queued on the inotify fd."""
+        events = []
+        try:
+            while True:
+                buf = os.read(self._fd, 65536)
+                if not buf:
+                    break
+                pos = 0
+                while pos + _EVENT.size <= len(buf):
+                    wd, _mask, _cookie, length = _EVENT.unpack_from(buf, pos)
+                    pos += _EVENT.size
+                    events.append((wd, os.fsdecode(buf[pos:pos + length].rstrip(b"\0"))))
+                    pos += length
+        except BlockingIOError:
+            pass   # drained
+        return events
+
+    def _relevant(self, events):
+        for wd, name in events:
+            d = self._wds.get(wd)
+            if d is None:
+                continue
+            if d in self.paths or os.path.join(d, name) in self.paths:
+                return True   # a watched directory, or one of the watched files in it
+        return False
+
+    def _loop(self):
+        last = self.signature()
+        try:
+            while not self._stop.is_set():
+                self._wait(self.poll_secs)
+                if self._stop.is_set():
+                    break
+                sig = self.signature()
+                if sig == last:
+                    continue
+                # let the writer finish (vector file, then metadata line)
+                while not self._stop.wait(self.settle_secs):
+                    now = self.signature()
+                    if now == sig:
+                        break
+                    sig = now
+                if self._stop.is_set():
+                    break
+                last = sig
+                self.changes += 1
+                try:
+                    self.on_change()
+                except Exception as e:
+                    print(f"[watcher] change handler failed: {e}")
+        finally:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def stop(self):
+        self._stop.set()
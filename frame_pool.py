@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+
+class FramePool:
+    """
+    Preallocated frame buffers reused across frames.
+
+    get(shape) hands out `count` arrays per (shape, dtype) in rotation, so a
+    steady-size camera stream never allocates after the first few frames.
+    A buffer is only valid until it comes round again (`count` gets later).
+    """
+
+    def __init__(self, count=2):
+        self.count = count
+        self._bufs = {}
+        self._next = {}
+        self.allocated = 0
+
+    def get(self, shape, dtype=np.uint8):
+        key = (tuple(shape), np.dtype(dtype).str)
+        bufs = self._bufs.get(key)
+        if bufs is None:
+            if len(self._bufs) >= 4:
+                self._bufs.clear()   # resolution changed; drop the old sizes
+                self._next.clear()
+            bufs = self._bufs[key] = []
+            self._next[key] = 0
+        i = self._next[key]
+        self._next[key] = (i + 1) % self.count
+        if i == len(bufs):
+            bufs.append(np.empty(shape, dtype=dtype))
+            self.allocated += 1
+        return bufs[i]
+
+
+class FrameRenderer:
+    """
+    Shows BGR frames on a Tk Label with one colour conversion per frame.
+
+    The BGR->RGB conversion is written into a pooled buffer, wrapped by PIL
+    without copying (Image.frombuffer) and pasted into the same PhotoImage
+    every frame; a new PhotoImage is only created when the size changes.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.pool = FramePool(count=1)
+        self.photo = None
+
+    def show(self, frame_bgr):
+        h, w = frame_bgr.shape[:2]
+        rgb = self.pool.get((h, w, 3))
+        cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB, dst=rgb)
+        img = Image.frombuffer("RGB", (w, h), rgb, "raw", "RGB", 0, 1)
+        if self.photo is None or (self.photo.width(), self.photo.height()) != (w, h):
+            self.photo = ImageTk.PhotoImage(image=img)
+            self.label.configure(image=self.photo)
+            self.label.imgtk = self.photo   # keep a reference or Tk drops the image
+        else:
+            self.photo.paste(img)
@@ -0,0 +1,157 @@
+import threading
+
+import numpy as np
+
+EMBED_DIM = 128
+
+
+class GalleryIndex:
+    """
+    Known-face gallery kept as one contiguous float32 matrix (rows = people)
+    with precomputed squared norms, so a whole batch of probe faces is matched
+    with a single matrix product instead of one face_distance() scan per face.
+    Rows are added/updated/removed in place; nothing is rebuilt on enrollment.
+    """
+
+    def __init__(self, dim=EMBED_DIM, capacity=1024):
+        self.dim = dim
+        self._mat = np.zeros((max(1, capacity), dim), dtype=np.float32)
+        self._sqnorms = np.zeros(max(1, capacity), dtype=np.float32)
+        self._names = []
+        self._rows = {}   # name -> row
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._rows
+
+    @property
+    def names(self):
+        with self._lock:
+            return list(self._names)
+
+    def matrix(self):
+        """Live (n, dim) view of the gallery; do not mutate."""
+        return self._mat[:len(self._names)]
+
+    def _grow(self, need):
+        cap = self._mat.shape[0]
+        if need <= cap:
+            return
+        while cap < need:
+            cap *= 2
+        mat = np.zeros((cap, self.dim), dtype=np.float32)
+        sq = np.zeros(cap, dtype=np.float32)
+        n = len(self._names)
+        mat[:n] = self._mat[:n]
+        sq[:n] = self._sqnorms[:n]
+        self._mat, self._sqnorms = mat, sq
+
+    def add(self, name, enc):
+        """Insert a new identity or overwrite the embedding of an existing one."""
+        v = np.asarray(enc, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            row = self._rows.get(name)
+            if row is None:
+                row = len(self._names)
+                self._grow(row + 1)
+                self._names.append(name)
+                self._rows[name] = row
+            self._mat[row] = v
+            self._sqnorms[row] = float(v @ v)
+
+    def add_many(self, names, encs):
+        """Bulk insert/overwrite; new rows are copied in with one slice assignment."""
+        x = np.asarray(encs, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            fresh = []
+            for name, v in zip(names, x):
+                if name in self._rows:
+                    self.add(name, v)
+                else:
+                    fresh.append((name, v))
+            if not fresh:
+                return
+            start = len(self._names)
+            self._grow(start + len(fresh))
+            block = np.asarray([v for _, v in fresh], dtype=np.float32)
+            self._mat[start:start + len(fresh)] = block
+            self._sqnorms[start:start + len(fresh)] = np.einsum("ij,ij->i", block, block)
+            for i, (name, _) in enumerate(fresh):
+                self._names.append(name)
+                self._rows[name] = start + i
+
+    def remove(self, name):
+        """Drop an identity by moving the last row into its slot (O(1))."""
+        with self._lock:
+            row = self._rows.pop(name, None)
+            if row is None:
+                return False
+            last = len(self._names) - 1
+            if row != last:
+                moved = self._names[last]
+                self._mat[row] = self._mat[last]
+                self._sqnorms[row] = self._sqnorms[last]
+                self._names[row] = moved
+                self._rows[moved] = row
+            self._names.pop()
+            return True
+
+    def apply(self, names, encs, removed=()):
+        """Upsert `names` and drop `removed` in one step; a concurrent match() sees all of it or none."""
+        with self._lock:
+            for name in removed:
+                self.remove(name)
+            if len(names):
+                self.add_many(names, encs)
+
+    def clear(self):
+        with self._lock:
+            self._names.clear()
+            self._rows.clear()
+
+    def top2(self, encs):
+        """
+        Nearest and runner-up Euclidean distance for each probe embedding.
+        Returns (best_idx, best_dist, second_dist) arrays of length len(encs);
+        second_dist is inf when the gallery holds a single face.
+        """
+        q = np.asarray(encs, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            n = len(self._names)
+            if n == 0 or len(q) == 0:
+                empty = np.full(len(q), np.inf, dtype=np.float32)
+                return np.full(len(q), -1, dtype=np.int64), empty, empty.copy()
+            g = self._mat[:n]
+            d2 = self._sqnorms[:n][None, :] - 2.0 * (q @ g.T)
+        d2 += np.einsum("ij,ij->i", q, q)[:, None]
+        np.maximum(d2, 0.0, out=d2)
+
+        rows = np.arange(len(q))
+        if n == 1:
+            return np.zeros(len(q), dtype=np.int64), np.sqrt(d2[:, 0]), np.full(len(q), np.inf, dtype=np.float32)
+        part = np.argpartition(d2, 1, axis=1)[:, :2]
+        pd = d2[rows[:, None], part]
+        order = np.argsort(pd, axis=1)
+        best = part[rows, order[:, 0]]
+        return best, np.sqrt(pd[rows, order[:, 0]]), np.sqrt(pd[rows, order[:, 1]])
+
+    def match(self, encs, threshold, margin):
+        """
+        Batch version of the DIST_THRESHOLD/MARGIN rule used by the apps.
+        Returns a list of (name or "Unknown", best_distance) per probe.
+        """
+        with self._lock:
+            best, d1, d2 = self.top2(encs)
+            names = self._names
+            out = []
+            for i, a, b in zip(best, d1, d2):
+                if i < 0:
+                    out.append(("Unknown", 1.0))
+                    continue
+                gap = float(b - a) if np.isfinite(b) else 1.0
+                name = names[int(i)] if (a < threshold and gap >= margin) else "Unknown"
+                out.append((name, float(a)))
+        return out
@@ -0,0 +1,10 @@
+import os
+import re
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def person_name(filename):
+    """Person a face image belongs to: file name without extension and trailing "_<digits>" stamp."""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return re.sub(r"_\d+$", "", stem) or stem
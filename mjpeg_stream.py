@@ -0,0 +1,132 @@
+import re
+
+import cv2
+import numpy as np
+
+from fast_decode import JpegFrame
+
+_CONTENT_LENGTH = re.compile(rb"content-length:\s*(\d+)", re.IGNORECASE)
+SOI = b"\xff\xd8"
+EOI = b"\xff\xd9"
+
+
+class MJPEGStreamParser:
+    """
+    Incremental splitter for multipart/x-mixed-replace MJPEG streams.
+
+    Socket data is read straight into one preallocated bytearray (readinto),
+    parts are located in place, and the newest complete JPEG is handed to
+    cv2.imdecode through a memoryview slice, so the compressed bytes are never
+    copied. Part bodies are delimited by their Content-Length header when the
+    camera sends one (Android IP Webcam does) and by the JPEG SOI/EOI markers
+    otherwise. When more than one frame has piled up since the last decode,
+    only the newest is decoded; the rest are counted in `dropped`.
+    With lazy=True the newest part is returned as a JpegFrame (one copy of
+    the compressed bytes) so the consumer picks the decode size.
+    """
+
+    def __init__(self, bufsize=1 << 21, decode_flags=cv2.IMREAD_COLOR, lazy=False):
+        self._buf = bytearray(bufsize)
+        self._view = memoryview(self._buf)
+        self._len = 0
+        self.decode_flags = decode_flags
+        self.lazy = lazy
+        self.received = 0    # complete JPEG parts seen
+        self.decoded = 0
+        self.dropped = 0
+        self.bad = 0         # parts imdecode rejected
+
+    def free_view(self):
+        """Writable view of the unused tail of the buffer, for readinto()."""
+        if self._len == len(self._buf):
+            self._grow()
+        return self._view[self._len:]
+
+    def commit(self, n):
+        """Record that `n` bytes were written into free_view()."""
+        self._len += n
+
+    def feed(self, data):
+        """Copying fallback for sources without readinto (e.g. chunked HTTP)."""
+        while len(data) > len(self._buf) - self._len:
+            self._grow()
+        self._buf[self._len:self._len + len(data)] = data
+        self._len += len(data)
+
+    def _grow(self):
+        # only when a single frame is bigger than the buffer
+        buf = bytearray(len(self._buf) * 2)
+        buf[:self._len] = self._buf[:self._len]
+        self._buf, self._view = buf, memoryview(buf)
+
+    def _split(self):
+        """(start, end) offsets of every complete JPEG in the buffer, and the consumed length."""
+        buf, n, pos = self._buf, self._len, 0
+        parts = []
+        while True:
+            hdr_end = buf.find(b"\r\n\r\n", pos, n)
+            if hdr_end < 0:
+                break
+            m = _CONTENT_LENGTH.search(buf, pos, hdr_end)
+            if m:
+                start = hdr_end + 4
+                end = start + int(m.group(1))
+            else:
+                start = buf.find(SOI, hdr_end, n)
+                if start < 0:
+                    break
+                end = buf.find(EOI, start + 2, n)
+                end = -1 if end < 0 else end + 2
+            if end < 0 or end > n:
+                break
+            parts.append((start, end))
+            pos = end
+        return parts, pos
+
+    def next_frame(self):
+        """Newest complete frame (decoded, or JpegFrame if lazy), or None if none is complete yet."""
+        parts, used = self._split()
+        if not parts:
+            if self._len == len(self._buf) and self._buf.find(b"\r\n\r\n", 0, self._len) < 0:
+                self._len = 0   # garbage with no part header at all; resync
+            return None
+        self.received += len(parts)
+        self.dropped += len(parts) - 1
+        start, end = parts[-1]
+        if self.lazy:
+            frame = JpegFrame(bytes(self._view[start:end]))
+        else:
+            frame = cv2.imdecode(np.frombuffer(self._view[start:end], dtype=np.uint8), self.decode_flags)
+        if frame is None:
+            self.bad += 1
+        else:
+            self.decoded += 1
+        # keep only the incomplete tail (usually a few bytes of the next header)
+        rest = self._len - used
+        if rest:
+            self._buf[:rest] = self._buf[used:self._len]
+        self._len = rest
+        return frame
+
+
+def read_mjpeg(resp, parser, on_frame, running=lambda: True):
+    """
+    Pump an http.client response through `parser`, calling on_frame(frame)
+    for every decoded frame until the stream ends or running() is False.
+    """
+    fp = getattr(resp, "fp", None)
+    zero_copy = fp is not None and hasattr(fp, "readinto1") and not getattr(resp, "chunked", False)
+    while running():
+        if zero_copy:
+            n = fp.readinto1(parser.free_view())
+            if not n:
+                return
+            parser.commit(n)
+        else:
+            chunk = resp.read1(65536)
+            if not chunk:
+                return
+            parser.feed(chunk)
+        frame = parser.next_frame()
+        if frame is not None:
+            on_frame(frame)
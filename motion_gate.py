@@ -0,0 +1,67 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Cheap "did anything change?" check run before face detection.
+
+    Each frame is shrunk to a tiny grayscale thumbnail (`width` px wide) and
+    compared with a running-average background. Detection is allowed when at
+    least `area_frac` of the thumbnail pixels differ by more than
+    `pixel_thresh` grey levels, for `hold_secs` after the last motion (so a
+    person who just stopped is still picked up), and once every
+    `refresh_secs` as a safety net. Otherwise the caller can skip detection.
+    """
+
+    def __init__(self, width=64, pixel_thresh=12, area_frac=0.002, learn_rate=0.05,
+                 hold_secs=1.5, refresh_secs=30.0):
+        self.width = width
+        self.pixel_thresh = pixel_thresh
+        self.area_frac = area_frac
+        self.learn_rate = learn_rate
+        self.hold_secs = hold_secs
+        self.refresh_secs = refresh_secs
+        self._bg = None
+        self._last_motion = 0.0
+        self._last_run = 0.0
+        self.checked = 0
+        self.skipped = 0
+        self.last_changed = 0.0
+        self._lock = threading.Lock()
+
+    def _thumb(self, frame_bgr):
+        h, w = frame_bgr.shape[:2]
+        tw = min(self.width, w)
+        th = max(1, int(round(h * tw / float(w))))
+        small = cv2.resize(frame_bgr, (tw, th), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (3, 3), 0).astype(np.float32)
+
+    def should_detect(self, frame_bgr, now=None):
+        now = time.time() if now is None else now
+        thumb = self._thumb(frame_bgr)
+        with self._lock:
+            self.checked += 1
+            if self._bg is None or self._bg.shape != thumb.shape:
+                self._bg = thumb
+                self._last_motion = now
+            else:
+                diff = cv2.absdiff(thumb, self._bg)
+                self.last_changed = float(np.count_nonzero(diff > self.pixel_thresh)) / diff.size
+                cv2.accumulateWeighted(thumb, self._bg, self.learn_rate)
+                if self.last_changed >= self.area_frac:
+                    self._last_motion = now
+            run = bool((now - self._last_motion) <= self.hold_secs or (now - self._last_run) >= self.refresh_secs)
+            if run:
+                self._last_run = now
+            else:
+                self.skipped += 1
+            return run
+
+    def reset(self):
+        with self._lock:
+            self._bg = None
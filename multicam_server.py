@@ -0,0 +1,209 @@
+"""
+Headless multi-camera recognition service.
+
+One process serves every gate at a site: one shared in-memory gallery, one
+attendance log, any mix of USB camera indices and IP-camera snapshot URLs.
+
+    python multicam_server.py --source 0 --source 1 \
+        --source http://192.0.0.4:8080/shot.jpg --interval-ms 250
+
+Each round the scheduler takes at most one fresh frame per camera, starting
+at a rotating offset so no camera starves when a round is capped by
+--max-batch. Detection and encoding run per frame on a thread pool, then
+every face of the round is matched against the gallery in a single batch.
+IP cameras are kept as compressed JPEGs and decoded at reduced size
+(IMREAD_REDUCED_COLOR_*) for detection; the full-size decode is only done
+for frames that contain faces. --roi limits a camera's search to a band of
+the frame; between periodic full scans of it only windows around the faces
+seen last round are searched. --detector picks the detection backend per
+camera (HOG, Haar/LBP cascades, OpenCV DNN; see face_detectors).
+"""
+import warnings
+warnings.filterwarnings(
+    "ignore",
+    message=".pkg_resources is deprecated as an API.",
+    category=UserWarning,
+    module="face_recognition_models"
+)
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import face_recognition
+import numpy as np
+
+from attendance import AttendanceSink, CSVBackend
+from cooldown_store import CooldownStore
+from camera_reader import open_source
+from embedding_store import EmbeddingStore
+from face_core import face_quality_ok
+from fast_decode import JpegFrame
+from gallery_index import GalleryIndex
+from face_detectors import DETECTOR_KINDS, make_detector
+from roi_detect import RoiDetector, parse_roi
+
+DIST_THRESHOLD = 0.45
+MARGIN = 0.03
+MIN_FACE_SIZE = 80
+MIN_BLUR_VAR = 120.0
+COOLDOWN_SECS = 120
+UPSCALE = 0
+DOWNSCALE = 0.5
+ROI_FULL_SCAN_SECS = 1.0
+
+
+class CameraSlot:
+    def __init__(self, cam_id, reader, roi=None, detector="hog"):
+        self.cam_id = cam_id
+        self.reader = reader
+        self.roi = RoiDetector(roi, full_scan_secs=ROI_FULL_SCAN_SECS,
+                               detector=make_detector(detector, upsample=UPSCALE))
+        self.boxes = []         # faces found last round: next round's search windows
+        self.seen = 0           # reader.frame_count at the last frame we took
+        self.processed = 0
+        self.recognized = 0
+
+
+class MultiCameraServer:
+    def __init__(self, sources, gallery, records, sink, interval_ms=250, scale=DOWNSCALE,
+                 max_batch=None, workers=None, rois=None, detectors=None):
+        rois = list(rois or []) + [None] * len(sources)
+        detectors = list(detectors or []) + ["hog"] * len(sources)
+        self.cams = [CameraSlot(str(src), open_source(src, lazy_decode=True), roi, det)
+                     for src, roi, det in zip(sources, rois, detectors)]
+        self.gallery = gallery
+        self.records = records
+        self.sink = sink
+        self.interval_ms = interval_ms
+        self.scale = scale
+        self.max_batch = max_batch or len(self.cams)
+        self.pool = ThreadPoolExecutor(max_workers=workers or len(self.cams))
+        self.running = False
+        self._rr = 0
+
+    def next_round(self):
+        """Fair pick: at most one new frame per camera, rotating who goes first."""
+        n = len(self.cams)
+        batch = []
+        for k in range(n):
+            cam = self.cams[(self._rr + k) % n]
+            if cam.reader.frame_count == cam.seen:
+                continue   # nothing new since last round
+            frame = cam.reader.read_jpeg() if hasattr(cam.reader, "read_jpeg") else None
+            if frame is None:
+                frame = cam.reader.read()
+            if frame is None:
+                continue
+            cam.seen = cam.reader.frame_count
+            batch.append((cam, frame))
+            if len(batch) >= self.max_batch:
+                break
+        self._rr = (self._rr + 1) % max(1, n)
+        return batch
+
+    def _detect(self, item):
+        cam, frame = item
+        if isinstance(frame, JpegFrame):
+            small, scale = frame.for_detection(self.scale)
+            if small is None:
+                return cam, []
+            boxes = cam.roi.detect(cv2.cvtColor(small, cv2.COLOR_BGR2RGB), scale, cam.boxes, prescaled=True)
+            cam.boxes = boxes
+            if not boxes:
+                return cam, []   # empty frame: never decoded at full size
+            rgb = cv2.cvtColor(frame.full(), cv2.COLOR_BGR2RGB)
+        else:
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            boxes = cam.boxes = cam.roi.detect(rgb, self.scale, cam.boxes)
+        boxes = [b for b in boxes if face_quality_ok(rgb, b, MIN_FACE_SIZE, MIN_BLUR_VAR)]
+        encs = face_recognition.face_encodings(rgb, boxes) if boxes else []
+        return cam, encs
+
+    def process_round(self, batch):
+        detected = list(self.pool.map(self._detect, batch))
+        owners, encs = [], []
+        for cam, cam_encs in detected:
+            cam.processed += 1
+            owners.extend([cam] * len(cam_encs))
+            encs.extend(cam_encs)
+        if not encs:
+            return
+        for cam, (name, d) in zip(owners, self.gallery.match(np.asarray(encs), DIST_THRESHOLD, MARGIN)):
+            if name == "Unknown":
+                continue
+            cam.recognized += 1
+            rec = self.records.get(name, {})
+            when = self.sink.mark(name, rec.get('mobile', ''))
+            if when:
+                print(f"[{when:%H:%M:%S}] cam {cam.cam_id}: {name} marked present (dist {d:.3f})")
+
+    def run(self):
+        for cam in self.cams:
+            cam.reader.start()
+        self.running = True
+        last_report = time.time()
+        try:
+            while self.running:
+                t0 = time.time()
+                batch = self.next_round()
+                if batch:
+                    self.process_round(batch)
+                if time.time() - last_report > 30:
+                    last_report = time.time()
+                    print(" | ".join(
+                        f"{c.cam_id}: {c.processed} frames, {c.recognized} hits, "
+                        f"{getattr(c.reader, 'dropped_frames', 0)} dropped" for c in self.cams))
+                time.sleep(max(0.0, self.interval_ms / 1000.0 - (time.time() - t0)))
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.running = False
+        for cam in self.cams:
+            cam.reader.stop()
+        self.pool.shutdown(wait=False)
+        self.sink.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--source", action="append", required=True, help="USB index or snapshot URL (repeatable)")
+    ap.add_argument("--roi", action="append", type=parse_roi, default=[],
+                    help="x0,y0,x1,y1 search band (frame fractions) for the matching --source, in order; '-' = whole frame")
+    ap.add_argument("--detector", action="append", default=[],
+                    help=f"detector for the matching --source, in order ({', '.join(DETECTOR_KINDS)}[:model files]); default hog")
+    ap.add_argument("--store", default="face_data", help="embedding store base path")
+    ap.add_argument("--attendance", default="attendance_log.csv", help=".csv, or .db for SQLite (WAL)")
+    ap.add_argument("--cooldown-db", default="attendance_cooldown.db",
+                    help="cooldown shared with other recognition processes")
+    ap.add_argument("--interval-ms", type=int, default=250)
+    ap.add_argument("--scale", type=float, default=DOWNSCALE)
+    ap.add_argument("--max-batch", type=int, default=None, help="max frames per round (default: all cameras)")
+    ap.add_argument("--workers", type=int, default=None, help="detection threads (default: one per camera)")
+    args = ap.parse_args()
+
+    store = EmbeddingStore(args.store)
+    gallery = GalleryIndex(capacity=max(1024, len(store.records)))
+    names = list(store.records)
+    if names:
+        gallery.add_many(names, store.vectors()[[store.records[n]['row'] for n in names]])
+    print(f"Gallery: {len(gallery)} people from {store.vec_path}; cameras: {', '.join(args.source)}")
+
+    cooldowns = CooldownStore(args.cooldown_db, COOLDOWN_SECS)
+    sink = AttendanceSink(args.attendance, COOLDOWN_SECS, cooldown_store=cooldowns)
+    if isinstance(sink.backend, CSVBackend):
+        cooldowns.seed_from_csv(args.attendance)
+    server = MultiCameraServer(args.source, gallery, store.records, sink,
+                               interval_ms=args.interval_ms, scale=args.scale,
+                               max_batch=args.max_batch, workers=args.workers, rois=args.roi,
+                               detectors=args.detector)
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        print("\nStopping.")
+
+
+if __name__ == "__main__":
+    main()
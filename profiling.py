@@ -0,0 +1,197 @@
+import functools
+import json
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class LatencyHistogram:
+    """Last `size` samples (ms) in a fixed float32 ring; percentiles over that window."""
+
+    def __init__(self, size=512):
+        self._buf = np.zeros(size, dtype=np.float32)
+        self._i = 0
+        self.count = 0      # total samples ever recorded
+        self.total_ms = 0.0
+        self.last = 0.0
+
+    def add(self, ms):
+        self._buf[self._i] = ms
+        self._i = (self._i + 1) % len(self._buf)
+        self.count += 1
+        self.total_ms += ms
+        self.last = ms
+
+    def percentiles(self, qs=(50, 95, 99)):
+        n = min(self.count, len(self._buf))
+        if n == 0:
+            return [0.0] * len(qs)
+        return [float(v) for v in np.percentile(self._buf[:n], qs)]
+
+
+class _Stage:
+    __slots__ = ("prof", "name", "t0")
+
+    def __init__(self, prof, name):
+        self.prof = prof
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.prof.record(self.name, (time.perf_counter() - self.t0) * 1000.0)
+        return False
+
+
+class _NoStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+class Profiler:
+    """
+    Stage timers for the face apps: capture, decode, resize, detect, encode,
+    match, draw, render.
+
+        with profiler.stage("detect"):
+            boxes = face_recognition.face_locations(...)
+
+        @profiler.timed("encode")
+        def encode(...): ...
+
+    Each stage keeps a rolling window of `window` samples in a fixed array
+    (no per-sample allocation) for p50/p95/p99; tick(name) counts loop
+    iterations for an FPS figure. With enabled=False stage() returns a shared
+    no-op context, so the hooks can stay in place on slow kiosks.
+    """
+
+    def __init__(self, window=512, enabled=True):
+        self.window = window
+        self.enabled = enabled
+        self.stages = {}
+        self._ticks = {}     # name -> LatencyHistogram of intervals
+        self._last_tick = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        return _Stage(self, name) if self.enabled else _NO_STAGE
+
+    def timed(self, name):
+        def wrap(fn):
+            @functools.wraps(fn)
+            def inner(*args, **kwargs):
+                with self.stage(name):
+                    return fn(*args, **kwargs)
+            return inner
+        return wrap
+
+    def record(self, name, ms):
+        if not self.enabled:
+            return
+        with self._lock:
+            h = self.stages.get(name)
+            if h is None:
+                h = self.stages[name] = LatencyHistogram(self.window)
+            h.add(ms)
+
+    def tick(self, name="frame"):
+        """Mark one iteration of a loop (UI render, recognition pass); feeds fps()."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            last = self._last_tick.get(name)
+            self._last_tick[name] = now
+            if last is None:
+                return
+            h = self._ticks.get(name)
+            if h is None:
+                h = self._ticks[name] = LatencyHistogram(min(self.window, 120))
+            h.add((now - last) * 1000.0)
+
+    def fps(self, name="frame"):
+        with self._lock:
+            h = self._ticks.get(name)
+            if h is None or h.count == 0:
+                return 0.0
+            p50 = h.percentiles((50,))[0]
+        return 1000.0 / p50 if p50 > 0 else 0.0
+
+    def snapshot(self):
+        """{stage: {count, last, mean, p50, p95, p99}} plus {"fps": {loop: fps}}."""
+        with self._lock:
+            items = list(self.stages.items())
+            loops = list(self._ticks)
+        out = {}
+        for name, h in items:
+            p50, p95, p99 = h.percentiles()
+            out[name] = {"count": h.count, "last": h.last, "mean": h.total_ms / max(1, h.count),
+                         "p50": p50, "p95": p95, "p99": p99}
+        return {"stages": out, "fps": {n: self.fps(n) for n in loops}}
+
+    # ---------------- Output ----------------
+    def draw(self, frame_bgr, order=None, origin=(8, 8)):
+        """Small p50/p95 table in the frame corner (in place)."""
+        snap = self.snapshot()
+        names = [n for n in (order or sorted(snap["stages"])) if n in snap["stages"]]
+        lines = [" ".join(f"{k} {v:.1f}fps" for k, v in snap["fps"].items())]
+        lines += [f"{n:<8}{snap['stages'][n]['p50']:6.1f}{snap['stages'][n]['p95']:7.1f} ms" for n in names]
+        x, y = origin
+        h = 16 * len(lines) + 6
+        roi = frame_bgr[y:y + h, x:x + 200]
+        np.floor_divide(roi, 3, out=roi)   # darken behind the text instead of alpha-blending
+        for i, line in enumerate(lines):
+            cv2.putText(frame_bgr, line, (x + 4, y + 16 * (i + 1)), cv2.FONT_HERSHEY_PLAIN, 1.0,
+                        (0, 255, 180), 1, cv2.LINE_AA)
+        return frame_bgr
+
+    def to_json(self):
+        snap = self.snapshot()
+        snap["time"] = time.time()
+        return json.dumps(snap, indent=2)
+
+    def to_prometheus(self, prefix="face_app"):
+        snap = self.snapshot()
+        out = [f"# TYPE {prefix}_stage_latency_ms summary"]
+        for name, s in snap["stages"].items():
+            for q, key in ((0.5, "p50"), (0.95, "p95"), (0.99, "p99")):
+                out.append(f'{prefix}_stage_latency_ms{{stage="{name}",quantile="{q}"}} {s[key]:.3f}')
+            out.append(f'{prefix}_stage_latency_ms_count{{stage="{name}"}} {s["count"]}')
+            out.append(f'{prefix}_stage_latency_ms_sum{{stage="{name}"}} {s["mean"] * s["count"]:.3f}')
+        out.append(f"# TYPE {prefix}_fps gauge")
+        for name, v in snap["fps"].items():
+            out.append(f'{prefix}_fps{{loop="{name}"}} {v:.2f}')
+        return "\n".join(out) + "\n"
+
+    def export(self, path):
+        """Write metrics atomically; Prometheus text format for .prom/.txt paths, JSON otherwise."""
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(text)
+        os.replace(tmp, path)   # readers (node_exporter textfile collector) never see a partial file
+
+    def start_export(self, path, every_secs=10.0):
+        """Export to `path` every `every_secs` on a daemon thread. Returns a stop() callable."""
+        stop = threading.Event()
+
+        def loop():
+            while not stop.wait(every_secs):
+                try:
+                    self.export(path)
+                except OSError as e:
+                    print(f"[profiling] export to {path} failed: {e}")
+
+        threading.Thread(target=loop, daemon=True).start()
+        return stop.set
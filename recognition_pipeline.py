@@ -0,0 +1,170 @@
+import threading
+import time
+import traceback
+from collections import deque
+
+
+class LatestSlot:
+    """
+    Single-item hand-off between stages. put() overwrites whatever is still
+    waiting (counted as dropped), so consumers always see the newest frame and
+    a slow stage never builds up a backlog of stale ones.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+            self._cond.notify()
+
+    def take(self, timeout=None):
+        with self._cond:
+            if self._item is None:
+                self._cond.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+    def poll(self):
+        with self._cond:
+            item, self._item = self._item, None
+            return item
+
+    def depth(self):
+        with self._cond:
+            return 0 if self._item is None else 1
+
+
+class StageTimer:
+    """Rolling latency samples (ms) for one stage."""
+
+    def __init__(self, size=120):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, ms):
+        with self._lock:
+            self._samples.append(ms)
+
+    def summary(self):
+        with self._lock:
+            s = sorted(self._samples)
+        if not s:
+            return {'avg': 0.0, 'p95': 0.0, 'last': 0.0}
+        return {'avg': sum(s) / len(s), 'p95': s[min(len(s) - 1, int(len(s) * 0.95))], 'last': self._samples[-1]}
+
+
+class RecognitionPipeline:
+    """
+    capture thread -> LatestSlot -> worker thread(s) running `process(frame)`
+    -> LatestSlot of results -> UI thread via poll().
+
+    The capture side calls submit() (CameraReader.on_frame). Workers start a
+    new frame at most every `min_interval_ms`, always on the freshest frame.
+    `process` must not touch Tk; the UI applies results from poll().
+    A process() that returns None (frame skipped) delivers nothing.
+    """
+
+    def __init__(self, process, workers=1, min_interval_ms=0):
+        self.process = process
+        self.workers = workers
+        self.min_interval_ms = min_interval_ms
+        self.frames = LatestSlot()
+        self.results = LatestSlot()
+        self.timers = {'queue': StageTimer(), 'process': StageTimer(), 'deliver': StageTimer()}
+        self.submitted = 0
+        self.processed = 0
+        self.errors = 0
+        self._last_error = None   # repr of the last exception whose traceback was printed
+        self.running = False
+        self._threads = []
+        self._seq = 0
+        self._last_delivered = 0
+        self._next_start = 0.0
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(self.workers)]
+        for t in self._threads:
+            t.start()
+
+    def stop(self):
+        self.running = False
+        self.frames.put(None)
+        for t in self._threads:
+            t.join(timeout=1.0)
+        self._threads = []
+
+    def submit(self, frame):
+        """Hand a captured frame to the workers; replaces any frame still waiting."""
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            self.submitted += 1
+        self.frames.put((seq, time.perf_counter(), frame))
+
+    def _pace(self):
+        # share one cadence between all workers
+        with self._lock:
+            now = time.perf_counter()
+            start = max(now, self._next_start)
+            self._next_start = start + self.min_interval_ms / 1000.0
+        if start > now:
+            time.sleep(start - now)
+
+    def _work(self):
+        while self.running:
+            self._pace()
+            item = self.frames.take(timeout=0.5)
+            if item is None:
+                continue
+            seq, t_sub, frame = item
+            t0 = time.perf_counter()
+            self.timers['queue'].add((t0 - t_sub) * 1000.0)
+            try:
+                result = self.process(frame)
+            except Exception as e:
+                self.errors += 1
+                if repr(e) != self._last_error:   # a failure repeating every frame is printed once
+                    self._last_error = repr(e)
+                    print(f"[pipeline] recognition failed ({self.errors} errors so far):")
+                    traceback.print_exc()
+                continue
+            t1 = time.perf_counter()
+            self.timers['process'].add((t1 - t0) * 1000.0)
+            with self._lock:
+                self.processed += 1
+                if result is None:
+                    continue
+                if seq < self._last_delivered:
+                    continue  # a newer frame already finished on another worker
+                self._last_delivered = seq
+            self.results.put((t1, result))
+
+    def poll(self):
+        """Latest finished result, or None if nothing new since the last poll."""
+        item = self.results.poll()
+        if item is None:
+            return None
+        t_done, result = item
+        self.timers['deliver'].add((time.perf_counter() - t_done) * 1000.0)
+        return result
+
+    def stats(self):
+        return {
+            'submitted': self.submitted,
+            'processed': self.processed,
+            'dropped_frames': self.frames.dropped,
+            'dropped_results': self.results.dropped,
+            'errors': self.errors,
+            'queue_depth': self.frames.depth() + self.results.depth(),
+            'latency_ms': {k: t.summary() for k, t in self.timers.items()},
+        }
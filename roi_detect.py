@@ -0,0 +1,127 @@
+import time
+
+import cv2
+
+from face_detectors import HogDetector
+
+
+def parse_roi(text):
+    """'x0,y0,x1,y1' (fractions of the frame) -> tuple; '', '-' or None -> None (whole frame)."""
+    if not text or text == "-":
+        return None
+    x0, y0, x1, y1 = (float(v) for v in text.split(","))
+    if not (0.0 <= x0 < x1 <= 1.0 and 0.0 <= y0 < y1 <= 1.0):
+        raise ValueError(f"bad ROI {text!r}: need 0 <= x0 < x1 <= 1 and 0 <= y0 < y1 <= 1")
+    return x0, y0, x1, y1
+
+
+def _merge(rects):
+    """Union overlapping (x0, y0, x1, y1) rects into their bounding boxes until none overlap."""
+    rects = list(rects)
+    merged = True
+    while merged:
+        merged = False
+        out = []
+        for r in rects:
+            for i, o in enumerate(out):
+                if r[0] < o[2] and o[0] < r[2] and r[1] < o[3] and o[1] < r[3]:
+                    out[i] = (min(r[0], o[0]), min(r[1], o[1]), max(r[2], o[2]), max(r[3], o[3]))
+                    merged = True
+                    break
+            else:
+                out.append(r)
+        rects = out
+    return rects
+
+
+class RoiDetector:
+    """
+    Face detection restricted to where faces can be.
+
+    `static_roi` (x0, y0, x1, y1 as fractions of the frame) is the camera's
+    fixed search band, e.g. the doorway strip at a gate; None = whole frame.
+    Between full scans of that band only padded windows around the last
+    known face boxes are searched (`pad` x the box size on each side), so
+    detection cost follows the area of the windows, not the frame. The full
+    band is rescanned every `full_scan_secs`, and whenever nothing is being
+    tracked, to pick up new arrivals. Windows that together cover more than
+    `max_window_frac` of the band fall back to one band scan. `detector` is
+    any face_detectors backend (HOG with `upsample` when None).
+    """
+
+    def __init__(self, static_roi=None, pad=0.6, full_scan_secs=1.0, upsample=0,
+                 max_window_frac=0.6, min_window=96, detector=None):
+        self.static_roi = static_roi
+        self.pad = pad
+        self.full_scan_secs = full_scan_secs
+        self.upsample = upsample
+        self.detector = detector or HogDetector(upsample)
+        self.max_window_frac = max_window_frac
+        self.min_window = min_window
+        self._last_full = 0.0
+        self.full_scans = 0
+        self.window_scans = 0
+        self.scanned_frac = 1.0    # EMA of scanned area / frame area
+
+    def band(self, w, h):
+        if self.static_roi is None:
+            return 0, 0, w, h
+        x0, y0, x1, y1 = self.static_roi
+        return int(x0 * w), int(y0 * h), int(round(x1 * w)), int(round(y1 * h))
+
+    def plan(self, w, h, known_boxes, now):
+        """Rects (x0, y0, x1, y1) in full-frame pixels to scan this pass."""
+        bx0, by0, bx1, by1 = self.band(w, h)
+        band_area = max(1, (bx1 - bx0) * (by1 - by0))
+        if not known_boxes or now - self._last_full >= self.full_scan_secs:
+            self._last_full = now
+            self.full_scans += 1
+            return [(bx0, by0, bx1, by1)]
+        rects = []
+        for (t, r, b, l) in known_boxes:
+            pw = max(int((r - l) * self.pad), (self.min_window - (r - l)) // 2, 0)
+            ph = max(int((b - t) * self.pad), (self.min_window - (b - t)) // 2, 0)
+            x0, y0 = max(bx0, l - pw), max(by0, t - ph)
+            x1, y1 = min(bx1, r + pw), min(by1, b + ph)
+            if x1 > x0 and y1 > y0:
+                rects.append((x0, y0, x1, y1))
+        rects = _merge(rects)
+        if not rects or sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in rects) > self.max_window_frac * band_area:
+            self._last_full = now
+            self.full_scans += 1
+            return [(bx0, by0, bx1, by1)]
+        self.window_scans += 1
+        return rects
+
+    def detect(self, rgb, scale, known_boxes=(), now=None, prescaled=False):
+        """
+        Face boxes (top, right, bottom, left) in full-frame coordinates.
+
+        rgb is the full-size frame (each window is cropped, then resized by
+        `scale`), or with prescaled=True an image already resized by `scale`
+        (e.g. a reduced JPEG decode), which is cropped directly.
+        """
+        now = time.time() if now is None else now
+        h, w = rgb.shape[:2]
+        if prescaled:
+            w, h = int(round(w / scale)), int(round(h / scale))
+        rects = self.plan(w, h, list(known_boxes), now)
+        boxes = []
+        scanned = 0
+        for x0, y0, x1, y1 in rects:
+            scanned += (x1 - x0) * (y1 - y0)
+            if prescaled:
+                sx0, sy0, sx1, sy1 = (int(v * scale) for v in (x0, y0, x1, y1))
+                img = rgb[sy0:sy1, sx0:sx1]
+            else:
+                img = rgb[y0:y1, x0:x1]
+                if scale != 1.0:
+                    img = cv2.resize(img, (0, 0), fx=scale, fy=scale)
+            if img.size == 0:
+                continue
+            found = self.detector.detect(img)
+            inv = 1.0 / scale
+            for (t, r, b, l) in found:
+                boxes.append((int(t * inv) + y0, int(r * inv) + x0, int(b * inv) + y0, int(l * inv) + x0))
+        self.scanned_frac += 0.1 * (scanned / float(max(1, w * h)) - self.scanned_frac)
+        return boxes